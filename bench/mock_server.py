@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Recorded API responses served by the mock server
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "r") as f:
+        return json.load(f)
+
+
+def week_shift(latest, now):
+    # Whole weeks that move the recorded `latest` as close to `now` as possible without passing it,
+    # so recorded trading days stay on weekdays
+    return timedelta(weeks=max(0, (now - latest).days // 7))
+
+
+def rebase_candles(candles, now):
+    # Move FinnHub candle timestamps forward so the series ends in the current week
+    if not candles.get("t"):
+        return candles
+    shift = int(week_shift(datetime.fromtimestamp(candles["t"][-1], timezone.utc), now).total_seconds())
+    return dict(candles, t=[t + shift for t in candles["t"]])
+
+
+def rebase_series(series, now, fmt):
+    # Same as rebase_candles() for Alpha Vantage's {"<date>": bar} series
+    latest = datetime.strptime(max(series), fmt).replace(tzinfo=timezone.utc)
+    shift = week_shift(latest, now)
+    return {
+        (datetime.strptime(key, fmt) + shift).strftime(fmt): bar
+        for key, bar in series.items()
+    }
+
+
+def rebase_forecast(forecast, now):
+    # Forecast records start at the current 3-hour slot, like a live response
+    records = forecast.get("list", [])
+    if not records:
+        return forecast
+    slot = now.replace(hour=now.hour - now.hour % 3, minute=0, second=0, microsecond=0)
+    shift = int(slot.timestamp()) - records[0]["dt"]
+    rebased = []
+    for record in records:
+        dt = record["dt"] + shift
+        rebased.append(dict(record, dt=dt, dt_txt=datetime.fromtimestamp(dt, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")))
+    return dict(forecast, list=rebased)
+
+
+class MockApiHandler(BaseHTTPRequestHandler):
+    """Serves FinnHub under /finnhub, Alpha Vantage under /alphavantage and OpenWeatherMap under /owm."""
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+    def do_GET(self):
+        self.server.count_request(self.path)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = self.server.route(url.path, params, datetime.now(timezone.utc))
+        if body is None:
+            self.send_json(404, {"error": "not found"})
+            return
+
+        # Stable validator per body, so conditional requests can be exercised
+        etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_json(200, body, {"ETag": etag})
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), latency=0.0):
+        super().__init__(address, MockApiHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.request_log = []
+        self.fixtures = {name: load_fixture(name) for name in os.listdir(FIXTURES_DIR) if name.endswith(".json")}
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def count_request(self, path):
+        with self.lock:
+            self.request_log.append(path)
+
+    def request_count(self):
+        with self.lock:
+            return len(self.request_log)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def route(self, path, params, now):
+        fixtures = self.fixtures
+
+        # --- FinnHub ---
+        if path == "/finnhub/quote":
+            return fixtures["finnhub_quote.json"]
+        if path == "/finnhub/stock/candle":
+            return rebase_candles(fixtures["finnhub_stock_candle.json"], now)
+        if path == "/finnhub/crypto/candle":
+            candles = fixtures["finnhub_crypto_candle.json"] if params.get("resolution") == "1" else fixtures["finnhub_stock_candle.json"]
+            return rebase_candles(candles, now)
+
+        # --- Alpha Vantage ---
+        if path == "/alphavantage/query":
+            function = params.get("function")
+            if function == "TIME_SERIES_INTRADAY":
+                data = fixtures["alphavantage_intraday.json"]
+                key = f"Time Series ({params.get('interval', '1min')})"
+                return {"Meta Data": data["Meta Data"], key: rebase_series(data["Time Series (1min)"], now, "%Y-%m-%d %H:%M:%S")}
+            if function == "TIME_SERIES_DAILY":
+                data = fixtures["alphavantage_daily.json"]
+                return dict(data, **{"Time Series (Daily)": rebase_series(data["Time Series (Daily)"], now, "%Y-%m-%d")})
+            if function == "REALTIME_BULK_QUOTES":
+                row = fixtures["alphavantage_bulk.json"]["data"][0]
+                symbols = [s for s in params.get("symbol", "").split(",") if s]
+                return {"endpoint": "Realtime Bulk Quotes", "data": [dict(row, symbol=s) for s in symbols]}
+            return {"Information": f"Unknown function {function}"}
+
+        # --- OpenWeatherMap ---
+        if path == "/owm/forecast":
+            return rebase_forecast(fixtures["owm_forecast.json"], now)
+        if path == "/owm/weather":
+            return dict(fixtures["owm_weather.json"], dt=int(now.timestamp()))
+
+        return None
+
+
+def main():
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Serve recorded FinnHub / Alpha Vantage / OpenWeatherMap responses locally.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default is 127.0.0.1)")
+    parser.add_argument("--port", default=8760, type=int, help="Port to listen on (default is 8760)")
+    parser.add_argument("--latency_ms", default=0, type=int, help="Artificial delay added to every response (default is 0)")
+    args = parser.parse_args()
+
+    server = MockApiServer((args.host, args.port), latency=args.latency_ms / 1000)
+    print(f"MGCONKY_FINNHUB_URL={server.url}/finnhub", flush=True)
+    print(f"MGCONKY_ALPHAVANTAGE_URL={server.url}/alphavantage/query", flush=True)
+    print(f"MGCONKY_OPENWEATHERMAP_URL={server.url}/owm/", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+
+from mock_server import MockApiServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+STOCKS_DIR = os.path.join(REPO_DIR, "stocks")
+WEATHER_DIR = os.path.join(REPO_DIR, "weather")
+RESULTS_PATH = os.path.join(BENCH_DIR, "results", "latest.json")
+
+# Programs wrapped by a logging shim so every exec of them is counted as a subprocess
+COUNTED_PROGRAMS = ["python3", "bash", "sh", "jq", "bc", "curl", "cat", "cp", "date", "sed", "awk", "grep"]
+
+# Same symbol lists the conf passes, mixing stocks and a crypto pair
+FINNHUB_SYMBOLS = "AAPL,MSFT,NVDA,BINANCE:BTCUSDT"
+ALPHAVANTAGE_SYMBOLS = "AAPL,MSFT,NVDA"
+
+# The forecast fields the conf showed through parse_forecast.sh before the field files existed
+LEGACY_FORECAST_QUERIES = (
+    [["min", ".main.temp_min", str(day)] for day in range(4)]
+    + [["max", ".main.temp_max", str(day)] for day in range(4)]
+    + [["first", ".weather[0].id", str(day)] for day in range(1, 4)]
+)
+LEGACY_WEATHER_QUERIES = [["iconid"], ["location"], ["temperature"]]
+
+
+def scenarios():
+    # name -> commands run once before timing (setup), commands making up one refresh cycle, required tools
+    finnhub = os.path.join(STOCKS_DIR, "get_stocks_finnhub.py")
+    av_fetch = os.path.join(STOCKS_DIR, "get_stocks_alphavantage.py")
+    av_process = os.path.join(STOCKS_DIR, "process_stocks_alphavantage.py")
+    get_weather = [os.path.join(WEATHER_DIR, "get_weather.py"), "bench", "5128581", "metric"]
+
+    return {
+        # --blocking: the refresh runs in the measured process, not in the detached child the execpi path
+        # forks (whose requests, RSS and time wait4() would miss, and which could outlive the temp HOME)
+        "finnhub_intraday": {
+            "cycle": [[finnhub, "--api_key", "bench", "--symbols", FINNHUB_SYMBOLS, "--range_in_days", "0", "--blocking"]],
+        },
+        "finnhub_historical": {
+            "cycle": [[finnhub, "--api_key", "bench", "--symbols", FINNHUB_SYMBOLS, "--range_in_days", "30", "--blocking"]],
+        },
+        "alphavantage_fetch": {
+            "cycle": [[av_fetch, "--api_key", "bench", "--symbols", ALPHAVANTAGE_SYMBOLS, "--range_in_days", "30"]],
+        },
+        "alphavantage_fetch_bulk": {
+            "cycle": [[av_fetch, "--api_key", "bench", "--symbols", ALPHAVANTAGE_SYMBOLS, "--range_in_days", "0", "--bulk"]],
+        },
+        "alphavantage_process": {
+            "setup": [[av_fetch, "--api_key", "bench", "--symbols", ALPHAVANTAGE_SYMBOLS, "--range_in_days", "30"]],
+            "cycle": [[av_process, "--symbols", ALPHAVANTAGE_SYMBOLS, "--range_in_days", "30"]],
+        },
+        "weather_fetch": {
+            "cycle": [get_weather],
+        },
+        "weather_summarize": {
+            "setup": [get_weather],
+            "cycle": [[os.path.join(WEATHER_DIR, "summarize_forecast.py")]],
+        },
+        "weather_parse_legacy": {
+            "setup": [get_weather],
+            "cycle": (
+                [[os.path.join(WEATHER_DIR, "parse_forecast.sh")] + q for q in LEGACY_FORECAST_QUERIES]
+                + [[os.path.join(WEATHER_DIR, "parse_weather.sh")] + q for q in LEGACY_WEATHER_QUERIES]
+            ),
+            "requires": ["jq", "bc"],
+        },
+    }
+
+
+def make_shims(shim_dir, log_path):
+    # One tiny wrapper per program: log the name, then exec the real binary (same PID, so RSS still counts)
+    for name in COUNTED_PROGRAMS:
+        real = shutil.which(name)
+        if real is None:
+            continue
+        path = os.path.join(shim_dir, name)
+        with open(path, "w") as f:
+            f.write(f"#!/bin/sh\necho {name} >> '{log_path}'\nexec '{real}' \"$@\"\n")
+        os.chmod(path, 0o755)
+
+
+def run_command(command, env, log_path):
+    # Run one command; returns (exit code, peak RSS in KiB, subprocesses started)
+    with open(log_path, "w"):
+        pass
+    with tempfile.TemporaryFile() as out:
+        process = subprocess.Popen(command, env=env, stdout=out, stderr=subprocess.DEVNULL)
+        # wait4() reports the child's own rusage, which includes every descendant it reaped
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    with open(log_path, "r") as f:
+        spawned = sum(1 for _ in f)
+    return process.returncode, usage.ru_maxrss, spawned
+
+
+def run_scenario(name, scenario, server, iterations):
+    missing = [tool for tool in scenario.get("requires", []) if shutil.which(tool) is None]
+    if missing:
+        return {"skipped": f"missing {', '.join(missing)}"}
+
+    # Fresh HOME per scenario: the first cycle is cold (empty ~/.cache/mgconky), later ones are warm
+    with tempfile.TemporaryDirectory(prefix="mgconky-bench-") as home:
+        shim_dir = os.path.join(home, "bin")
+        os.makedirs(shim_dir)
+        log_path = os.path.join(home, "exec.log")
+        make_shims(shim_dir, log_path)
+
+        env = dict(
+            os.environ,
+            HOME=home,
+            PATH=shim_dir + os.pathsep + os.environ.get("PATH", ""),
+            MGCONKY_FINNHUB_URL=f"{server.url}/finnhub",
+            MGCONKY_ALPHAVANTAGE_URL=f"{server.url}/alphavantage/query",
+            MGCONKY_OPENWEATHERMAP_URL=f"{server.url}/owm/",
+        )
+
+        for command in scenario.get("setup", []):
+            run_command(command, env, log_path)
+
+        runs = []
+        for _ in range(iterations):
+            requests_before = server.request_count()
+            started = time.perf_counter()
+            exit_codes, peak_rss, spawned = [], 0, 0
+            for command in scenario["cycle"]:
+                code, rss, count = run_command(command, env, log_path)
+                exit_codes.append(code)
+                peak_rss = max(peak_rss, rss)
+                spawned += count
+            runs.append({
+                "wall_seconds": round(time.perf_counter() - started, 4),
+                "subprocesses": spawned,
+                "peak_rss_kib": peak_rss,
+                "requests": server.request_count() - requests_before,
+                "failed_commands": sum(1 for code in exit_codes if code != 0),
+            })
+
+    result = {"cold": runs[0], "runs": runs}
+    if len(runs) > 1:
+        warm = runs[1:]
+        result["warm_median"] = {key: statistics.median(run[key] for run in warm) for key in runs[0]}
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new, threshold):
+    # Print warm-median wall time per scenario against an older results file; returns the regressed names
+    regressed = []
+    for name, result in new["scenarios"].items():
+        before = old.get("scenarios", {}).get(name, {}).get("warm_median")
+        after = result.get("warm_median")
+        if not before or not after or not before["wall_seconds"]:
+            continue
+        ratio = after["wall_seconds"] / before["wall_seconds"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressed.append(name)
+        print(f"{name:<26} {before['wall_seconds']:>8.3f}s -> {after['wall_seconds']:>8.3f}s  ({ratio:.2f}x){flag}")
+    return regressed
+
+
+def main():
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Benchmark the stocks and weather scripts against a local mock API server.")
+    parser.add_argument("--iterations", default=5, type=int, help="Refresh cycles per scenario; the first one is cold (default is 5)")
+    parser.add_argument("--scenarios", default=None, help="Comma-separated scenario names to run (default is all)")
+    parser.add_argument("--latency_ms", default=0, type=int, help="Artificial delay added to every mock response (default is 0)")
+    parser.add_argument("--output", default=RESULTS_PATH, help=f"Where to write the JSON results (default is {RESULTS_PATH})")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare warm wall times against")
+    parser.add_argument("--threshold", default=0.2, type=float, help="Slowdown ratio reported as a regression by --compare (default is 0.2)")
+    args = parser.parse_args()
+
+    available = scenarios()
+    selected = args.scenarios.split(",") if args.scenarios else list(available)
+    unknown = [name for name in selected if name not in available]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    server = MockApiServer(latency=args.latency_ms / 1000).start()
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "latency_ms": args.latency_ms,
+        },
+        "scenarios": {},
+    }
+
+    print(f"{'scenario':<26} {'cold':>9} {'warm':>9} {'procs':>6} {'rss KiB':>8} {'reqs':>5}")
+    for name in selected:
+        result = run_scenario(name, available[name], server, max(1, args.iterations))
+        results["scenarios"][name] = result
+        if "skipped" in result:
+            print(f"{name:<26} skipped ({result['skipped']})")
+            continue
+        warm = result.get("warm_median", result["cold"])
+        print(
+            f"{name:<26} {result['cold']['wall_seconds']:>8.3f}s {warm['wall_seconds']:>8.3f}s "
+            f"{warm['subprocesses']:>6g} {warm['peak_rss_kib']:>8g} {warm['requests']:>5g}"
+        )
+
+    server.shutdown()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    tmp = f"{args.output}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp, args.output)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            old = json.load(f)
+        if compare(old, results, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+from mock_server import MockApiServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+STOCKS_DIR = os.path.join(os.path.dirname(BENCH_DIR), "stocks")
+
+SYMBOLS = "AAPL,MSFT,NVDA"
+
+# Milliseconds a cache-hit run may take on top of starting a bare interpreter
+DEFAULT_BUDGET_MS = 60
+
+# Modules that only a run which actually fetches (or serves) should load
+HEAVY_MODULES = ("requests", "urllib3", "concurrent.futures", "sqlite3", "socketserver", "http.client", "ssl")
+
+
+def scenarios():
+    # name -> commands run once before timing (setup) and the cache-hit command that is timed
+    finnhub = os.path.join(STOCKS_DIR, "get_stocks_finnhub.py")
+    av_fetch = os.path.join(STOCKS_DIR, "get_stocks_alphavantage.py")
+    av_process = os.path.join(STOCKS_DIR, "process_stocks_alphavantage.py")
+    finnhub_command = [finnhub, "--api_key", "bench", "--symbols", SYMBOLS, "--range_in_days", "0", "--blocking"]
+    av_fetch_command = [av_fetch, "--api_key", "bench", "--symbols", SYMBOLS, "--range_in_days", "30"]
+    av_process_command = [av_process, "--symbols", SYMBOLS, "--range_in_days", "30"]
+
+    return {
+        # Market closed -> rendered from ~/.cache/mgconky/stocks_finnhub/ without a request.  While the market
+        # is open every FinnHub run refreshes by design, so those runs are reported but not judged.
+        "finnhub_cached": {
+            "setup": [finnhub_command],
+            "command": finnhub_command,
+            "refreshes_while_open": True,
+        },
+        # Every symbol cached within the no-thrash window -> no request at all
+        "alphavantage_fetch_cached": {
+            "setup": [av_fetch_command],
+            "command": av_fetch_command,
+        },
+        # Index unchanged since the last render -> memoized block is printed
+        "alphavantage_process_cached": {
+            "setup": [av_fetch_command, av_process_command],
+            "command": av_process_command,
+        },
+    }
+
+
+def run(command, env, import_log=None):
+    # Run one command with the benchmark's own interpreter; returns (exit code, wall milliseconds)
+    python = [sys.executable, "-X", "importtime"] if import_log else [sys.executable]
+    started = time.perf_counter()
+    process = subprocess.run(python + command, env=env, stdout=subprocess.DEVNULL, stderr=import_log or subprocess.DEVNULL)
+    return process.returncode, (time.perf_counter() - started) * 1000
+
+
+def imported_modules(log_path):
+    # Module names from a -X importtime log
+    modules = set()
+    with open(log_path, "r") as f:
+        for line in f:
+            if line.startswith("import time:") and "|" in line:
+                name = line.rsplit("|", 1)[1].strip()
+                if name != "imported package":
+                    modules.add(name)
+    return modules
+
+
+def main():
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Check that the stocks scripts start within a time budget when served from cache.")
+    parser.add_argument("--runs", default=15, type=int, help="Timed runs per scenario (default is 15)")
+    parser.add_argument("--budget_ms", default=DEFAULT_BUDGET_MS, type=float, help=f"Allowed median milliseconds above a bare interpreter start (default is {DEFAULT_BUDGET_MS})")
+    args = parser.parse_args()
+
+    server = MockApiServer().start()
+    failed = []
+
+    with tempfile.TemporaryDirectory(prefix="mgconky-startup-") as home:
+        env = dict(
+            os.environ,
+            HOME=home,
+            MGCONKY_FINNHUB_URL=f"{server.url}/finnhub",
+            MGCONKY_ALPHAVANTAGE_URL=f"{server.url}/alphavantage/query",
+        )
+
+        baseline = statistics.median(run(["-c", "pass"], env)[1] for _ in range(args.runs))
+        print(f"{'interpreter':<30} {baseline:>7.1f}ms")
+
+        for name, scenario in scenarios().items():
+            for command in scenario.get("setup", []):
+                run(command, env)
+
+            requests_before = server.request_count()
+            timings = []
+            for _ in range(args.runs):
+                code, elapsed = run(scenario["command"], env)
+                if code != 0:
+                    failed.append(f"{name} exited with {code}")
+                    break
+                timings.append(elapsed)
+            if not timings:
+                continue
+
+            log_path = os.path.join(home, f"{name}.importtime")
+            with open(log_path, "w") as log:
+                run(scenario["command"], env, log)
+            heavy = sorted(module for module in imported_modules(log_path) if module in HEAVY_MODULES)
+            requests_made = server.request_count() - requests_before
+
+            overhead = statistics.median(timings) - baseline
+            if requests_made and scenario.get("refreshes_while_open"):
+                print(f"{name:<30} {statistics.median(timings):>7.1f}ms  (+{overhead:.1f}ms)  not judged: market open, every run refreshes")
+                continue
+            problems = []
+            if overhead > args.budget_ms:
+                problems.append(f"over budget by {overhead - args.budget_ms:.1f}ms")
+            if heavy:
+                problems.append(f"imports {', '.join(heavy)}")
+            if requests_made:
+                problems.append(f"made {requests_made} requests")
+            if problems:
+                failed.append(f"{name} {'; '.join(problems)}")
+            print(f"{name:<30} {statistics.median(timings):>7.1f}ms  (+{overhead:.1f}ms){'  FAIL' if problems else ''}")
+
+    server.shutdown()
+
+    for failure in failed:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
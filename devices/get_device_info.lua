@@ -121,103 +121,153 @@ function conky_get_gpu_info()
 end
 
 
--- ########################################################## GET DRIVES AND VOLUMES ###########################################################
-
--- Cache so we don't spam this every conky tick
-local conky_drives_cache_duration = 300 -- Cache output for 5 minutes
-local conky_drives_last_update_time = 0
-local conky_drives_cached_output = ""
+-- ########################################################## FILE READERS AND SOURCE CACHE #####################################################
+
+-- Everything below reads /proc and /sys directly, so no collector has to fork a process on a Conky tick.
+-- Each data source has its own time-to-live: memory moves constantly, mounts and interfaces rarely do.
+local conky_source_ttl = {
+    meminfo = 3,    -- /proc/meminfo
+    mounts = 30,    -- /proc/self/mountinfo + /sys/class/block
+    netdev = 15,    -- /proc/net/dev + /sys/class/net
+    connections = 3 -- /proc/net/tcp{,6}; the fd scan behind it only runs for unknown sockets
+}
+local conky_source_cache = {}
 
-function conky_get_drives_and_volumes()
+function conky_cached_source(source, collect)
     local current_time = os.time()
+    local entry = conky_source_cache[source]
 
-    -- Check if cache is still valid
-    if current_time - conky_drives_last_update_time < conky_drives_cache_duration then
-        return conky_drives_cached_output
+    -- Re-collect only when this source's TTL has run out
+    if not entry or current_time - entry.time >= conky_source_ttl[source] then
+        entry = { time = current_time, value = collect() }
+        conky_source_cache[source] = entry
     end
+    return entry.value
+end
 
-    -- Start fresh output
-    local output = ""
+function conky_read_file(path)
+    local file = io.open(path, "r")
+    if not file then
+        return nil
+    end
+    local contents = file:read("*a")
+    file:close()
+    return contents
+end
 
-    -- Use lsblk to get all devices and their mount points
-    local handle = io.popen("lsblk -ln -o NAME,TYPE,MOUNTPOINT,PKNAME")
-    if not handle then
-        return "Failed to execute lsblk command\n"
+-- ########################################################## GET DRIVES AND VOLUMES ###########################################################
+
+function conky_block_uevent(path)
+    -- DEVNAME / DEVTYPE of a block device from its sysfs uevent file
+    local uevent = conky_read_file(path .. "/uevent")
+    if not uevent then
+        return nil, nil
     end
-    local result = handle:read("*a")
-    handle:close()
+    return uevent:match("DEVNAME=([^\n]+)"), uevent:match("DEVTYPE=([^\n]+)")
+end
 
-    -- Parse the lsblk output and group partitions by parent drive
-    local devices = {}
-    local parent_drive = nil
-
-    for line in (result or ""):gmatch("[^\r\n]+") do
-        local name, dtype, mount, pkname = line:match("^(%S+)%s+(%S+)%s*(%S*)%s*(%S*)$")
-        if dtype == "disk" then
-            parent_drive = name
-            devices[parent_drive] = { mountpoints = {} }
-        elseif dtype == "part" and pkname == parent_drive and mount and mount ~= "" then
-            -- Only consider partitions with a non-empty mount point
-            table.insert(devices[parent_drive].mountpoints, mount)
-        elseif dtype == "dm" and pkname and mount and mount ~= "" then
-            -- Associate device-mapper (dm) devices with their parent physical disk
-            devices[pkname] = devices[pkname] or { mountpoints = {} }
-            table.insert(devices[pkname].mountpoints, mount)
+function conky_block_parent_disk(name, partition_names, depth)
+    -- Physical disk behind a block device: partitions live inside their disk's sysfs directory,
+    -- device-mapper devices (LUKS, LVM) list what they sit on under slaves/
+    depth = depth or 0
+    local path = "/sys/class/block/" .. name
+    local _, devtype = conky_block_uevent(path)
+    if devtype == "partition" then
+        return (conky_block_uevent(path .. "/.."))
+    end
+    if name:match("^dm%-") and depth < 8 then
+        for _, candidate in ipairs(partition_names) do
+            if conky_read_file(path .. "/slaves/" .. candidate .. "/uevent") then
+                return conky_block_parent_disk(candidate, partition_names, depth + 1)
+            end
         end
     end
+    return name
+end
 
-    -- Generate the output, only including drives with active mount points
-    for drive, data in pairs(devices) do
-        if #data.mountpoints > 0 then
-            output = output .. '${voffset 0}${color0}${font Neuropolitical:size=8:bold}DRIVE${font Courier:size=9} /dev/' .. drive .. '${color} ${color1}${hr 2}${color}\n'
-            for _, mount in ipairs(data.mountpoints) do
+function conky_unescape_mount(path)
+    -- mountinfo writes spaces, tabs, newlines and backslashes as octal escapes (\040 etc.)
+    return (path:gsub("\\(%d%d%d)", function(octal) return string.char(tonumber(octal, 8)) end))
+end
 
-                -- Skip entries that are not real mountpoints like [SWAP]
-                if mount:sub(1, 1) ~= "/" then
-                    goto continue
-                end
+function conky_skip_mount(mount)
+    -- Skip entries that are not real mountpoints like [SWAP]
+    if mount:sub(1, 1) ~= "/" then return true end
 
-                -- Skip common temporary mounts
-                if mount:match("^/sys/") then goto continue end
-                if mount:match("^/proc/") then goto continue end
-                if mount:match("^/dev/") then goto continue end
+    -- Skip common temporary mounts
+    if mount:match("^/sys/") then return true end
+    if mount:match("^/proc/") then return true end
+    if mount:match("^/dev/") then return true end
 
-                -- Skip mounts under /var/, but allow a mount at /var itself
-                if mount ~= "/var" and mount:match("^/var/") then goto continue end
+    -- Skip mounts under /var/, but allow a mount at /var itself
+    if mount ~= "/var" and mount:match("^/var/") then return true end
 
-                -- Skip runtime mounts except removable media
-                if mount:match("^/run/") and not mount:match("^/run/media/") then goto continue end
+    -- Skip runtime mounts except removable media
+    if mount:match("^/run/") and not mount:match("^/run/media/") then return true end
 
-                -- Use df to get the size and used space for the mount
-                local handle = io.popen("df -h --output=target,size,used " .. mount .. " | tail -n 1")
-                local df_result = handle:read("*a")
-                handle:close()
+    return false
+end
 
-                -- Parse df output
-                local target, size, used = df_result:match("(%S+)%s+(%S+)%s+(%S+)")
+function conky_collect_drives()
+    local mountinfo = conky_read_file("/proc/self/mountinfo")
+    if not mountinfo then
+        return "Failed to read /proc/self/mountinfo\n"
+    end
 
-                -- Ensure mount still exists before emitting fs_bar
-                local test = io.open(target, "r")
-                if not test then goto continue end
-                test:close()
+    -- Every block device name the kernel knows, used to look up device-mapper slaves
+    local partition_names = {}
+    for name in (conky_read_file("/proc/partitions") or ""):gmatch("%d+%s+%d+%s+%d+%s+(%S+)") do
+        table.insert(partition_names, name)
+    end
 
-                -- Create output lines for this mountpoint.
-                if target and size and used then
-                    output = output .. '${voffset 2}' .. target .. ': ${alignr}${color3}' .. used .. 'B${color} of ${color3}' .. size .. 'B${color}\n'
-                    output = output .. '${voffset -2}${color5}${fs_bar ' .. target .. '}${color}\n'
+    -- Group mount points by the physical disk they live on (mountinfo order, one entry per mount point)
+    local devices = {}
+    local drive_order = {}
+    local seen_mounts = {}
+    for line in mountinfo:gmatch("[^\r\n]+") do
+        local major_minor, mount, source = line:match("^%S+%s+%S+%s+(%S+)%s+%S+%s+(%S+).-%s%-%s+%S+%s+(%S+)")
+        mount = mount and conky_unescape_mount(mount)
+        if mount and not seen_mounts[mount] and not conky_skip_mount(mount) then
+            -- Block-backed filesystems have a real major number; btrfs subvolumes report 0:N, so use the source then
+            local name = nil
+            if not major_minor:match("^0:") then
+                name = conky_block_uevent("/sys/dev/block/" .. major_minor)
+            elseif source:match("^/dev/") then
+                name = source:match("([^/]+)$")
+                if not conky_read_file("/sys/class/block/" .. name .. "/uevent") then
+                    name = nil
                 end
+            end
 
-                ::continue::
+            if name then
+                local drive = conky_block_parent_disk(name, partition_names)
+                if not devices[drive] then
+                    devices[drive] = { mountpoints = {} }
+                    table.insert(drive_order, drive)
+                end
+                table.insert(devices[drive].mountpoints, mount)
+                seen_mounts[mount] = true
             end
-            output = output .. '\n' -- Add a blank line after the last mount point of the current drive
         end
     end
 
-    -- Cache and return the output
-    conky_drives_cached_output = output
-    conky_drives_last_update_time = current_time
+    -- Sizes come from Conky's own fs_used / fs_size (statvfs inside Conky, no df process)
+    local output = ""
+    table.sort(drive_order)
+    for _, drive in ipairs(drive_order) do
+        output = output .. '${voffset 0}${color0}${font Neuropolitical:size=8:bold}DRIVE${font Courier:size=9} /dev/' .. drive .. '${color} ${color1}${hr 2}${color}\n'
+        for _, mount in ipairs(devices[drive].mountpoints) do
+            output = output .. '${voffset 2}' .. mount .. ': ${alignr}${color3}${fs_used ' .. mount .. '}${color} of ${color3}${fs_size ' .. mount .. '}${color}\n'
+            output = output .. '${voffset -2}${color5}${fs_bar ' .. mount .. '}${color}\n'
+        end
+        output = output .. '\n' -- Add a blank line after the last mount point of the current drive
+    end
+
+    return output
+end
 
-    return conky_drives_cached_output
+function conky_get_drives_and_volumes()
+    return conky_cached_source("mounts", conky_collect_drives)
 end
 
 -- Run and print the output (for standalone testing)
@@ -226,50 +276,41 @@ print(conky_get_drives_and_volumes())
 
 -- ########################################################## GET VPN STATUS ###################################################################
 
--- Cache so we don't spam this every conky tick
-local conky_vpn_cache = {
-    last_update_time = 0,
-    cache_duration = 15, -- Cache output for 15 seconds
-    cached_output = ""
-}
+-- Interface flags from <linux/if.h>
+local IFF_UP = 0x1
+local IFF_POINTOPOINT = 0x10
 
-function conky_get_vpn_status()
-    local current_time = os.time()
-
-    -- Update cache only if more than 30 seconds have passed
-    if current_time - conky_vpn_cache.last_update_time > conky_vpn_cache.cache_duration then
-        -- Run the `ip a` command and capture its output
-        local handle = io.popen("ip a")
-        if not handle then
-            return "${color7}Error: Failed to execute 'ip a'${color}"
-        end
+function conky_has_flag(flags, flag)
+    -- Plain arithmetic instead of bit operators, so this also runs on Lua 5.1
+    return math.floor(flags / flag) % 2 == 1
+end
 
-        local result = handle:read("*a")
-        handle:close()
+function conky_collect_vpn_status()
+    -- Interface names from /proc/net/dev, flags from /sys/class/net/<name>/flags
+    local netdev = conky_read_file("/proc/net/dev")
+    if not netdev then
+        return "${color7}Error: Failed to read /proc/net/dev${color}"
+    end
 
-        -- Check for active VPN
-        local vpn_status = "Off"
-        local vpn_color = "${color7}" -- Red for Off
-
-        for line in result:gmatch("[^\r\n]+") do
-            -- Look for active POINTOPOINT interfaces
-            if line:find("POINTOPOINT") and line:find("UP") then
-                local device_name = line:match("^%d+: ([^:]+):")
-                if device_name then
-                    vpn_status = "On (" .. device_name .. ")"
-                    vpn_color = "${color6}" -- Blue for On
-                    break
-                end
-            end
+    -- Check for active VPN
+    local vpn_status = "Off"
+    local vpn_color = "${color7}" -- Red for Off
+
+    for device_name in netdev:gmatch("\n%s*([^%s:]+):") do
+        -- Look for active POINTOPOINT interfaces
+        local flags = tonumber((conky_read_file("/sys/class/net/" .. device_name .. "/flags") or ""):match("0x%x+") or "")
+        if flags and conky_has_flag(flags, IFF_POINTOPOINT) and conky_has_flag(flags, IFF_UP) then
+            vpn_status = "On (" .. device_name .. ")"
+            vpn_color = "${color6}" -- Blue for On
+            break
         end
-
-        -- Update cache
-        conky_vpn_cache.cached_output = vpn_color .. vpn_status .. "${color}"
-        conky_vpn_cache.last_update_time = current_time
     end
 
-    -- Return cached status
-    return conky_vpn_cache.cached_output
+    return vpn_color .. vpn_status .. "${color}"
+end
+
+function conky_get_vpn_status()
+    return conky_cached_source("netdev", conky_collect_vpn_status)
 end
 
 -- Test the function by printing the result
@@ -277,119 +318,87 @@ print(conky_get_vpn_status())
 
 -- ########################################################## GET MEMORY USAGE #################################################################
 
--- Cache so we don't spam this every conky tick
-local conky_memory_cache = {
-    last_update_time_swapstatus = 0,
-    last_update_time_memval = 0,
-    last_update_time_swapval = 0,
-    cache_duration = 15, -- Cache output for 1 minute
-    cached_output_swapstatus = "", -- Possible values: "swapenabled" | "swapdisabled"
-    cached_output_memval = "",
-    cached_output_swapval = ""
-}
-
-function conky_grep_memory(grep_filter)
+function conky_collect_meminfo()
+    -- All of /proc/meminfo in kB, e.g. { MemTotal = 16318324, MemAvailable = 9123456, ... }
+    local meminfo = {}
+    for key, value in (conky_read_file("/proc/meminfo") or ""):gmatch("([%w_()]+):%s+(%d+)") do
+        meminfo[key] = tonumber(value)
+    end
+    return meminfo
+end
 
-    -- Run the `free` command and capture its output
-    local handle = io.popen("free -h --si | grep " .. grep_filter)
-    if not handle then
-        return "Error: Failed to execute 'free'"
+function conky_format_si(kilobytes)
+    -- Same style as `free -h --si`: powers of 1000, one decimal below 10 (e.g. 7.1G, 16G, 0B)
+    local value = kilobytes * 1024
+    local units = { "", "K", "M", "G", "T", "P" }
+    local unit = 1
+    while value >= 1000 and unit < #units do
+        value = value / 1000
+        unit = unit + 1
     end
-    local result = handle:read("*a")
-    handle:close()
-    return result
+    if unit == 1 then
+        return string.format("%dB", value)
+    elseif value < 10 then
+        return string.format("%.1f%s", value, units[unit])
+    end
+    return string.format("%.0f%s", value, units[unit])
 end
 
 function conky_get_memory_usage(grep_filter)
-    local current_time = os.time()
+    local meminfo = conky_cached_source("meminfo", conky_collect_meminfo)
 
     -- Is arg "sys" or "swap"
+    local total, used
     if grep_filter == "sys" then
-
-        -- Is cache stale?
-        if current_time - conky_memory_cache.last_update_time_memval > conky_memory_cache.cache_duration then
-
-            -- Extract memory usage details
-            local grep_result = conky_grep_memory("Mem")
-            local total, used = grep_result:match("Mem:%s+(%S+)%s+(%S+)")
-            if not total or not used then
-                conky_memory_cache.cached_output_memval = "Error: Failed to parse memory usage"
-            else
-                -- Format the output as "X of Y" with color formatting
-                conky_memory_cache.cached_output_memval = "${color3}" .. used .. "B${color} of ${color3}" .. total .. "B${color}"
-            end
-
-            -- Update cache time
-            conky_memory_cache.last_update_time_memval = current_time
-
-            -- Debug
-            --print("DEBUG: UPDATED MEM VAL (" .. conky_memory_cache.cached_output_memval .. ")")
+        -- Same definition of "used" as free: everything that is not available
+        total = meminfo.MemTotal
+        used = total and meminfo.MemAvailable and total - meminfo.MemAvailable
+        if not used then
+            return "Error: Failed to parse memory usage"
         end
-
-        -- return mem cache (the mem cache has been updated if the duration has passed)
-        return conky_memory_cache.cached_output_memval
-
     else -- If arg is not "sys" we assume they are looking for swap
-
-        -- Is cache stale?
-        if current_time - conky_memory_cache.last_update_time_swapval > conky_memory_cache.cache_duration then
-
-            -- Extract swap usage details
-            local grep_result = conky_grep_memory("Swap")
-            local total, used = grep_result:match("Swap:%s+(%S+)%s+(%S+)")
-            if not total or not used then
-                conky_memory_cache.cached_output_swapval = "Error: Failed to parse swap usage"
-            else
-                -- Format the output as "X of Y" with color formatting
-                conky_memory_cache.cached_output_swapval = "${color3}" .. used .. "B${color} of ${color3}" .. total .. "B${color}"
-            end
-
-            -- Update cache time
-            conky_memory_cache.last_update_time_swapval = current_time
-
-            -- Debug
-            --print("DEBUG: UPDATED SWAP VAL (" .. conky_memory_cache.cached_output_swapval .. ")")
+        total = meminfo.SwapTotal
+        used = total and meminfo.SwapFree and total - meminfo.SwapFree
+        if not used then
+            return "Error: Failed to parse swap usage"
         end
-
-        -- return swap cache (the swap cache has been updated if the duration has passed)
-        return conky_memory_cache.cached_output_swapval
     end
+
+    -- Format the output as "X of Y" with color formatting
+    return "${color3}" .. conky_format_si(used) .. "B${color} of ${color3}" .. conky_format_si(total) .. "B${color}"
 end
 
 function conky_check_swap_status()
-    local current_time = os.time()
-
-    -- Is cache stale?
-    if current_time - conky_memory_cache.last_update_time_swapstatus > conky_memory_cache.cache_duration then
-
-        local grep_result = conky_grep_memory("Swap")
-        local total = grep_result:match("Swap:%s+(%S+)")
-        if not total or total == "0B" or total == "0" then
-            conky_memory_cache.cached_output_swapstatus = "swapdisabled"
-        else
-            conky_memory_cache.cached_output_swapstatus = "swapenabled"
-        end
-
-        -- Update cache
-        conky_memory_cache.last_update_time_swapstatus = current_time
+    local meminfo = conky_cached_source("meminfo", conky_collect_meminfo)
+    if meminfo.SwapTotal and meminfo.SwapTotal > 0 then
+        return "swapenabled"
     end
-
-    -- Debug
-    --print("DEBUG: UPDATED SWAP STATUS (" .. conky_memory_cache.cached_output_swapstatus .. ")")
-
-    -- Return cached output
-    return conky_memory_cache.cached_output_swapstatus
+    return "swapdisabled"
 end
 
 -- Test the function by printing the result
 print("Initial Memory Check Function Outputs:")
 print("    CHECK SWAP STATUS = " .. conky_check_swap_status())
-print("    GET MEMORY USAGE = " .. conky_get_memory_usage("mem"))
+print("    GET MEMORY USAGE = " .. conky_get_memory_usage("sys"))
 print("    GET SWAP USAGE = " .. conky_get_memory_usage("swap"))
 
 
 -- ####################################################### GET ACTIVE CONNECTIONS ##############################################################
 
+-- Socket inode -> PID, kept between refreshes so the fd scan only runs when unknown sockets show up
+local conky_socket_owners = {}
+-- Inodes no readable process holds (other users' sockets); not searched for again
+local conky_socket_unowned = {}
+-- PID -> process name from /proc/<pid>/comm
+local conky_process_names = {}
+-- PIDs whose fds have been read (PID -> true); later scans only read processes started since
+local conky_scanned_pids = {}
+
+-- luaposix, when installed, lets the fd scan list /proc and read the fd links without a subprocess
+local conky_posix_found, conky_posix_dirent = pcall(require, "posix.dirent")
+local conky_posix_unistd = conky_posix_found and require("posix.unistd") or nil
+if not conky_posix_found then conky_posix_dirent = nil end
+
 function conky_get_key_with_highest_value(t)
     local max_key = nil
     local max_value = -math.huge  -- Initialize with the smallest possible number
@@ -404,25 +413,169 @@ function conky_get_key_with_highest_value(t)
     return max_key
 end
 
-function conky_get_connections()
-    local handle = io.popen("ss -eptH | grep ESTAB 2>/dev/null")
-    if not handle then return "Error: Unable to execute ss command" end
+function conky_read_established_inodes()
+    -- Inodes of every ESTABLISHED (state 01) TCP socket, IPv4 and IPv6
+    local inodes = {}
+    for _, path in ipairs({ "/proc/net/tcp", "/proc/net/tcp6" }) do
+        local file = io.open(path, "r")
+        if file then
+            for line in file:lines() do
+                -- sl local_address rem_address st tx_queue:rx_queue tr:tm->when retrnsmt uid timeout inode
+                local state, inode = line:match("^%s*%d+:%s+%S+%s+%S+%s+(%x%x)%s+%S+%s+%S+%s+%S+%s+%d+%s+%d+%s+(%d+)")
+                if state == "01" and inode ~= "0" then
+                    inodes[inode] = true
+                end
+            end
+            file:close()
+        end
+    end
+    return inodes
+end
 
-    local process_names = {}
-    local process_counts = {}
+function conky_list_pids()
+    -- Numeric entries of /proc
+    local pids = {}
+    local function add(name)
+        if name:match("^%d+$") then pids[#pids + 1] = tonumber(name) end
+    end
+    if conky_posix_dirent then
+        local ok, names = pcall(conky_posix_dirent.dir, "/proc")
+        for _, name in ipairs(ok and names or {}) do add(name) end
+    else
+        local handle = io.popen("ls /proc 2>/dev/null")
+        if handle then
+            for name in handle:lines() do add(name) end
+            handle:close()
+        end
+    end
+    return pids
+end
 
-    -- Read each line of output
+function conky_read_socket_fds(pids, found)
+    -- Adds socket inode -> PID for every socket fd the given (readable) processes hold
+    if #pids == 0 then
+        return
+    end
+    if conky_posix_dirent then
+        for _, pid in ipairs(pids) do
+            local dir = "/proc/" .. pid .. "/fd/"
+            local ok, names = pcall(conky_posix_dirent.dir, dir)
+            for _, name in ipairs(ok and names or {}) do
+                local inode = (conky_posix_unistd.readlink(dir .. name) or ""):match("^socket:%[(%d+)%]")
+                if inode then found[inode] = pid end
+            end
+        end
+        return
+    end
+    -- Without luaposix, one find lists the socket fds of just these processes as "/proc/<pid>/fd socket:[<inode>]"
+    local dirs = {}
+    for _, pid in ipairs(pids) do dirs[#dirs + 1] = "/proc/" .. pid .. "/fd" end
+    local handle = io.popen("find " .. table.concat(dirs, " ") .. " -lname 'socket:*' -printf '%h %l\\n' 2>/dev/null")
+    if not handle then
+        return
+    end
     for line in handle:lines() do
-        -- Extract process name and PID using pattern matching
-        local pname, pid = line:match('users:%(%("([^"]+)",pid=(%d+)')
-        pid = tonumber(pid)  -- Ensure pid is a number
-        if pname and pid then
-            -- Store process name by PID and count occurrences
+        local pid, inode = line:match("^/proc/(%d+)/fd socket:%[(%d+)%]")
+        if pid then found[inode] = tonumber(pid) end
+    end
+    handle:close()
+end
+
+function conky_claim_sockets(unknown, found)
+    -- Moves every unknown inode found in `found` to the owner map; true if none is left
+    local remaining = false
+    for inode in pairs(unknown) do
+        if found[inode] then
+            conky_socket_owners[inode] = found[inode]
+            unknown[inode] = nil
+        else
+            remaining = true
+        end
+    end
+    return not remaining
+end
+
+function conky_scan_socket_owners(unknown)
+    -- Processes not scanned before (all of them the first time); forget PIDs that have exited
+    local running = {}
+    local new_pids = {}
+    for _, pid in ipairs(conky_list_pids()) do
+        running[pid] = true
+        if not conky_scanned_pids[pid] then
+            conky_scanned_pids[pid] = true
+            new_pids[#new_pids + 1] = pid
+        end
+    end
+    for pid in pairs(conky_scanned_pids) do
+        if not running[pid] then conky_scanned_pids[pid] = nil end
+    end
+
+    local found = {}
+    conky_read_socket_fds(new_pids, found)
+    if not conky_claim_sockets(unknown, found) then
+        -- A new connection of an older process: most come from ones that already have connections (browsers etc.)
+        local owner_pids = {}
+        local listed = {}
+        for _, pid in ipairs(new_pids) do listed[pid] = true end
+        for _, pid in pairs(conky_socket_owners) do
+            if running[pid] and not listed[pid] then
+                listed[pid] = true
+                owner_pids[#owner_pids + 1] = pid
+            end
+        end
+        conky_read_socket_fds(owner_pids, found)
+        conky_claim_sockets(unknown, found)
+    end
+
+    -- Whatever is still unknown belongs to processes we cannot see, or older ones without other connections
+    for inode in pairs(unknown) do
+        conky_socket_unowned[inode] = true
+    end
+end
+
+function conky_collect_connections()
+    local inodes = conky_read_established_inodes()
+
+    -- Forget sockets that have closed since the last refresh
+    for inode in pairs(conky_socket_owners) do
+        if not inodes[inode] then conky_socket_owners[inode] = nil end
+    end
+    for inode in pairs(conky_socket_unowned) do
+        if not inodes[inode] then conky_socket_unowned[inode] = nil end
+    end
+
+    -- Only sockets never seen before need the fd scan
+    local unknown = {}
+    local has_unknown = false
+    for inode in pairs(inodes) do
+        if not conky_socket_owners[inode] and not conky_socket_unowned[inode] then
+            unknown[inode] = true
+            has_unknown = true
+        end
+    end
+    if has_unknown then
+        conky_scan_socket_owners(unknown)
+    end
+
+    -- Count connections per process
+    local process_names = {}
+    local process_counts = {}
+    for inode, pid in pairs(conky_socket_owners) do
+        local pname = conky_process_names[pid]
+        if not pname then
+            pname = (conky_read_file("/proc/" .. pid .. "/comm") or ""):match("[^\n]+")
+            conky_process_names[pid] = pname
+        end
+        if pname then
             process_names[pid] = pname
             process_counts[pid] = (process_counts[pid] or 0) + 1
         end
     end
-    handle:close()
+
+    -- Names of processes without sockets are dropped (their PIDs may be reused)
+    for pid in pairs(conky_process_names) do
+        if not process_counts[pid] then conky_process_names[pid] = nil end
+    end
 
     -- Header line
     local tab1_offset = "${goto 145}"
@@ -447,4 +600,6 @@ function conky_get_connections()
     return result
 end
 
-
+function conky_get_connections()
+    return conky_cached_source("connections", conky_collect_connections)
+end
@@ -0,0 +1,65 @@
+import os
+import sqlite3
+
+# One SQLite file holds the daily closes of every provider and symbol
+BAR_STORE_PATH = os.path.expanduser("~/.cache/mgconky/bars.sqlite3")
+
+
+class BarStore:
+    """Append-only store of daily closing prices keyed by (source, symbol, date).
+
+    Dates are "YYYY-MM-DD" strings, so the primary key index doubles as a
+    date-ordered index for range and nearest-prior lookups.
+    """
+
+    def __init__(self, path=BAR_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bars ("
+                " source TEXT NOT NULL,"
+                " symbol TEXT NOT NULL,"
+                " date TEXT NOT NULL,"
+                " close REAL NOT NULL,"
+                " PRIMARY KEY (source, symbol, date)"
+                ") WITHOUT ROWID"
+            )
+
+    def _connect(self):
+        # Short-lived connections keep the store safe to use from worker threads
+        return sqlite3.connect(self.path, timeout=10)
+
+    def append(self, source, symbol, bars):
+        # bars: iterable of (date, close); dates already stored are left untouched
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO bars (source, symbol, date, close) VALUES (?, ?, ?, ?)",
+                ((source, symbol, date, float(close)) for date, close in bars),
+            )
+
+    def last_date(self, source, symbol):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT MAX(date) FROM bars WHERE source = ? AND symbol = ?",
+                (source, symbol),
+            ).fetchone()
+        return row[0] if row else None
+
+    def closes_since(self, source, symbol, date):
+        # ([dates], [closes]) from `date` on, in date order (ready for binary search)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT date, close FROM bars WHERE source = ? AND symbol = ? AND date >= ? ORDER BY date",
+                (source, symbol, date),
+            ).fetchall()
+        return [row[0] for row in rows], [row[1] for row in rows]
+
+    def has_bars_on_or_before(self, source, symbol, date):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM bars WHERE source = ? AND symbol = ? AND date <= ? LIMIT 1",
+                (source, symbol, date),
+            ).fetchone()
+        return row is not None
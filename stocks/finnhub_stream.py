@@ -0,0 +1,92 @@
+import sys
+import json
+import time
+import threading
+from datetime import datetime
+
+
+def log_error(message):
+    """Print timestamped error message to stderr and flush immediately."""
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{ts}] {message}", file=sys.stderr, flush=True)
+
+
+class QuoteStream:
+    """Latest trade price per symbol from a FinnHub-style trade WebSocket.
+
+    Works against wss://ws.finnhub.io or a local replay_finnhub_feed.py. Needs the
+    optional websocket-client package (pip install websocket-client).
+    """
+
+    def __init__(self, url, api_key, symbols, record_path=None):
+        self.url = f"{url}?token={api_key}" if api_key else url
+        self.symbols = symbols
+        # Opened once (line-buffered, so an interrupted recording keeps every complete message)
+        self.record_file = open(record_path, "a", buffering=1) if record_path else None
+        self.prices = {}
+        self.version = 0
+        self.lock = threading.Lock()
+        self.updated = threading.Event()
+        self.started = time.monotonic()
+
+    def on_open(self, ws):
+        # One subscription per symbol over the same connection
+        for symbol in self.symbols:
+            ws.send(json.dumps({"type": "subscribe", "symbol": symbol}))
+
+    def on_message(self, ws, message):
+        if self.record_file:
+            # Keep relative arrival times so the replay server can reproduce the pacing
+            self.record_file.write(json.dumps({"t": round(time.monotonic() - self.started, 3), "message": message}) + "\n")
+
+        try:
+            data = json.loads(message)
+        except ValueError:
+            return
+        if data.get("type") != "trade":
+            return
+
+        # A message can carry many trades; the last one per symbol wins
+        with self.lock:
+            for trade in data.get("data") or []:
+                if trade.get("s") in self.symbols and isinstance(trade.get("p"), (int, float)):
+                    self.prices[trade["s"]] = trade["p"]
+            self.version += 1
+        self.updated.set()
+
+    def on_error(self, ws, error):
+        log_error(f"Trade stream error - {error}")
+
+    def run_forever(self):
+        import websocket
+
+        # Reconnect with capped exponential backoff whenever the connection drops
+        delay = 1
+        while True:
+            connected_at = time.monotonic()
+            app = websocket.WebSocketApp(
+                self.url,
+                on_open=self.on_open,
+                on_message=self.on_message,
+                on_error=self.on_error,
+            )
+            app.run_forever(ping_interval=30, ping_timeout=10)
+            if time.monotonic() - connected_at > 60:
+                delay = 1
+            time.sleep(delay)
+            delay = min(delay * 2, 300)
+
+    def start(self):
+        # Fail early (in the caller) if the optional dependency is missing
+        import websocket  # noqa: F401
+
+        threading.Thread(target=self.run_forever, daemon=True).start()
+
+    def snapshot(self):
+        # Copy of the latest prices plus a counter that changes whenever they do
+        with self.lock:
+            return dict(self.prices), self.version
+
+    def wait_for_update(self, timeout=None):
+        self.updated.wait(timeout)
+        self.updated.clear()
@@ -5,18 +5,56 @@ import sys
 import time
 import json
 import argparse
-import requests
 from datetime import datetime, timedelta
+from quote_cache import FetchHealth
+import horizons
+import market_calendar
+import sparkline
+import transport
+import metrics
+import single_flight
+
+# The HTTP client and the bar store are imported only once a request is actually due,
+# so runs served entirely from the per-symbol caches start quickly
 
 # Directory where per-symbol cache JSON files are stored
 CACHE_DIR = os.path.expanduser("~/.cache/mgconky/stocks_alphavantage/")
 
+# AlphaVantage endpoint (overridable, e.g. to point the benchmarks at a local mock server)
+ALPHAVANTAGE_API_URL = os.environ.get("MGCONKY_ALPHAVANTAGE_URL", "https://www.alphavantage.co/query")
+
 # Delay between API calls to respect AlphaVantage rate limits
 API_DELAY_SECONDS = 1
 
-# Minimum age before re-querying a symbol to avoid API thrashing
+# Minimum age before re-querying a symbol to avoid API thrashing while its market is open
+# (closed markets: one refresh after the close, then none until the next open)
 NO_THRASH_SECONDS = 60 * 60  # 1 hour
 
+# Provider name used for this fetcher's rows in the shared bar store
+BAR_SOURCE = "alphavantage"
+
+# Consolidated snapshot of every symbol's payload, read by process_stocks_alphavantage.py
+INDEX_PATH = os.path.join(CACHE_DIR, "index.json")
+
+# Free tier allows 25 requests per day; usage is tracked in a small file next to the symbol caches
+DAILY_REQUEST_LIMIT = 25
+QUOTA_PATH = os.path.join(CACHE_DIR, "quota.json")
+
+# Held while a run checks and refreshes the caches, so overlapping runs never fetch (or spend quota on) the same symbols
+REFRESH_LOCK_PATH = os.path.join(CACHE_DIR, "refresh.lock")
+
+# A run holding the lock longer than this is presumed hung (a full free-tier refresh takes well under a minute)
+REFRESH_LEASE_SECONDS = 300
+
+# REALTIME_BULK_QUOTES accepts up to 100 symbols per request
+BULK_MAX_SYMBOLS = 100
+
+# The compact daily series holds the last 100 sessions, which always reach back at least this many calendar days
+COMPACT_REACH_DAYS = 130
+
+# Intraday closes kept per symbol for the sparkline (about one per pixel across the widget, which is 225 px wide)
+SERIES_POINTS = 120
+
 
 def log_error(message):
     """Print timestamped error message to stderr and flush immediately."""
@@ -24,161 +62,416 @@ def log_error(message):
     print(f"[{ts}] {message}", file=sys.stderr, flush=True)
 
 
-def fetch_intraday_data(api_key, symbol, interval="1min"):
+def fetch_intraday_data(api_key, symbol, interval="1min", session=None):
     # Query AlphaVantage intraday endpoint for the given symbol
-    url = "https://www.alphavantage.co/query"
+    url = ALPHAVANTAGE_API_URL
     params = {
         "function": "TIME_SERIES_INTRADAY",
         "symbol": symbol,
         "interval": interval,
         "apikey": api_key
     }
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            time_series = data.get(f"Time Series ({interval})")
-
-            if time_series:
-                # Use earliest bar as open price and latest bar as current price
-                sorted_timestamps = sorted(time_series.keys())
-                open_time = sorted_timestamps[0]
-                latest_time = sorted_timestamps[-1]
-
-                return {
-                    "current_price": float(time_series[latest_time]["4. close"]),
-                    "compare_price": float(time_series[open_time]["1. open"]),
-                }
+    with metrics.FetchTimer(BAR_SOURCE, "fetch_intraday_data", symbol) as timer:
+        try:
+            response = timer.get(session or transport.default_session(), url, params=params, timeout=10)
+            if response.status_code == 200:
+                data = timer.json(response)
+                time_series = data.get(f"Time Series ({interval})")
+
+                if time_series:
+                    # Use earliest bar as open price and latest bar as current price
+                    sorted_timestamps = sorted(time_series.keys())
+                    open_time = sorted_timestamps[0]
+                    latest_time = sorted_timestamps[-1]
+
+                    # The whole series, reduced to what the sparkline can show: [[epoch seconds, close], ...]
+                    # Bar times are exchange time (US/Eastern), not this machine's local time
+                    tz = market_calendar.exchange_timezone()
+                    series = [
+                        (int(datetime.strptime(ts, "%Y-%m-%d %H:%M:%S").replace(tzinfo=tz).timestamp()), float(time_series[ts]["4. close"]))
+                        for ts in sorted_timestamps
+                    ]
+
+                    return {
+                        "current_price": float(time_series[latest_time]["4. close"]),
+                        "compare_price": float(time_series[open_time]["1. open"]),
+                        "series": sparkline.lttb(series, SERIES_POINTS),
+                    }
+                else:
+                    # API responded but did not include expected time series data
+                    log_error(f"No 'Time Series ({interval})' data found for {symbol}.")
             else:
-                # API responded but did not include expected time series data
-                log_error(f"No 'Time Series ({interval})' data found for {symbol}.")
-        else:
-            # HTTP error from AlphaVantage
-            log_error(f"Failed to fetch intraday data for {symbol} (HTTP {response.status_code})")
-    except requests.RequestException as e:
-        # Network or request failure
-        log_error(f"Failed to fetch intraday data for {symbol} - {e}")
+                # HTTP error from AlphaVantage
+                log_error(f"Failed to fetch intraday data for {symbol} (HTTP {response.status_code})")
+        except transport.request_errors() as e:
+            # Network or request failure
+            log_error(f"Failed to fetch intraday data for {symbol} - {e}")
 
     return None
 
 
-def fetch_historical_data(api_key, symbol, range_in_days):
+def fetch_bulk_quotes(api_key, symbols, session=None):
+    # Query AlphaVantage bulk quote endpoint for many symbols in a single request.
+    # Returns {symbol: quote} ({} on failure), or None when the key's plan does not include bulk quotes.
+    url = ALPHAVANTAGE_API_URL
+    params = {
+        "function": "REALTIME_BULK_QUOTES",
+        "symbol": ",".join(symbols),
+        "apikey": api_key
+    }
+    quotes = {}
+    with metrics.FetchTimer(BAR_SOURCE, "fetch_bulk_quotes", ",".join(symbols)) as timer:
+        try:
+            response = timer.get(session or transport.default_session(), url, params=params, timeout=10)
+            if response.status_code == 200:
+                data = timer.json(response)
+                rows = data.get("data")
+
+                if isinstance(rows, list):
+                    for row in rows:
+                        try:
+                            # Same shape as the intraday fetch: latest price vs. today's open
+                            quotes[row["symbol"].upper()] = {
+                                "current_price": float(row["close"]),
+                                "compare_price": float(row["open"]),
+                            }
+                        except (KeyError, TypeError, ValueError):
+                            continue
+                elif "Information" in data:
+                    # Bulk quotes are a premium endpoint; free keys get an "Information" message instead
+                    log_error(f"Bulk quotes unavailable on this key, using per-symbol requests until tomorrow - {data['Information']}")
+                    return None
+                else:
+                    log_error(f"Failed to fetch bulk quotes - {data.get('message') or 'no data'}")
+            else:
+                # HTTP error from AlphaVantage
+                log_error(f"Failed to fetch bulk quotes (HTTP {response.status_code})")
+        except transport.request_errors() as e:
+            # Network or request failure
+            log_error(f"Failed to fetch bulk quotes - {e}")
+
+    return quotes
+
+
+def fetch_historical_data(api_key, symbol, labels, store=None, session=None):
+    # Daily closes accumulate in the local bar store, so every horizon is a lookup into one series
+    from bar_store import BarStore
+
+    store = store or BarStore()
+
+    # Target calendar date per horizon; the oldest one decides how far back the store must reach
+    targets = horizons.target_dates(labels)
+    earliest = min(targets.values())
+
+    # The compact series (last 100 bars) is enough once the store reaches back to the oldest target and its
+    # newest bar is recent enough for compact to continue it; an older store would be left with a gap
+    last_date = store.last_date(BAR_SOURCE, symbol)
+    compact_from = (datetime.now() - timedelta(days=COMPACT_REACH_DAYS)).strftime("%Y-%m-%d")
+    outputsize = "full"
+    if last_date and last_date >= compact_from and store.has_bars_on_or_before(BAR_SOURCE, symbol, earliest):
+        outputsize = "compact"
+
     # Query AlphaVantage daily endpoint for historical comparison
-    url = "https://www.alphavantage.co/query"
+    url = ALPHAVANTAGE_API_URL
     params = {
         "function": "TIME_SERIES_DAILY",
         "symbol": symbol,
+        "outputsize": outputsize,
         "apikey": api_key
     }
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            time_series = data.get("Time Series (Daily)")
-
-            if time_series:
-                # Most recent trading day's close is the current price
-                latest_date = max(time_series.keys())
-                current_price = float(time_series[latest_date]["4. close"])
-
-                # Target calendar date for comparison
-                target = datetime.now() - timedelta(days=range_in_days)
-
-                # Walk backward up to 10 days to find a valid trading day
-                historical_price = None
-                for offset in range(10):
-                    d = (target - timedelta(days=offset)).strftime("%Y-%m-%d")
-                    if d in time_series:
-                        historical_price = float(time_series[d]["4. close"])
-                        break
-
-                return {
-                    "current_price": current_price,
-                    "compare_price": historical_price,
-                }
+    with metrics.FetchTimer(BAR_SOURCE, "fetch_historical_data", symbol) as timer:
+        # A compact request means the bar store already covered the target date
+        timer.cache(outputsize == "compact")
+        try:
+            response = timer.get(session or transport.default_session(), url, params=params, timeout=10)
+            if response.status_code == 200:
+                data = timer.json(response)
+                time_series = data.get("Time Series (Daily)")
+
+                if time_series:
+                    # Most recent trading day's close is the current price
+                    latest_date = max(time_series.keys())
+                    current_price = float(time_series[latest_date]["4. close"])
+
+                    # Append only bars newer than what is stored; the latest bar may still be
+                    # an in-progress session, so it is not stored until a newer one exists
+                    last_stored = store.last_date(BAR_SOURCE, symbol) or ""
+                    store.append(BAR_SOURCE, symbol, (
+                        (d, bar["4. close"]) for d, bar in time_series.items()
+                        if last_stored < d < latest_date
+                    ))
+
+                    # Nearest trading day at or before each target, by binary search over the stored dates.
+                    # The latest session is not stored yet but is the nearest one for targets on or after it.
+                    since = (datetime.strptime(earliest, "%Y-%m-%d") - timedelta(days=horizons.MAX_GAP_DAYS)).strftime("%Y-%m-%d")
+                    dates, closes = store.closes_since(BAR_SOURCE, symbol, since)
+                    if not dates or dates[-1] < latest_date:
+                        dates.append(latest_date)
+                        closes.append(current_price)
+                    compare_prices = horizons.closes_at(dates, closes, targets)
+
+                    return {
+                        "current_price": current_price,
+                        "compare_price": compare_prices[labels[0]],
+                        "compare_prices": compare_prices,
+                    }
+                else:
+                    # API responded but did not include expected daily series data
+                    log_error(f"No 'Time Series (Daily)' data found for {symbol}.")
             else:
-                # API responded but did not include expected daily series data
-                log_error(f"No 'Time Series (Daily)' data found for {symbol}.")
-        else:
-            # HTTP error from AlphaVantage
-            log_error(f"Failed to fetch historical data for {symbol} (HTTP {response.status_code})")
+                # HTTP error from AlphaVantage
+                log_error(f"Failed to fetch historical data for {symbol} (HTTP {response.status_code})")
 
-    except requests.RequestException as e:
-        # Network or request failure
-        log_error(f"Failed to fetch historical data for {symbol} - {e}")
+        except transport.request_errors() as e:
+            # Network or request failure
+            log_error(f"Failed to fetch historical data for {symbol} - {e}")
 
     return None
 
 
+def load_quota():
+    # Daily request counter; resets when the local date changes
+    today = datetime.now().strftime("%Y-%m-%d")
+    try:
+        with open(QUOTA_PATH, "r") as f:
+            quota = json.load(f)
+        if isinstance(quota, dict) and quota.get("date") == today and isinstance(quota.get("used"), int):
+            return quota
+    except Exception:
+        # Missing or unreadable counter -> start a fresh day
+        pass
+    return {"date": today, "used": 0}
+
+
+def record_requests(quota, count=1):
+    # Persist immediately so an interrupted run still accounts for what it spent
+    quota["used"] += count
+    tmp = f"{QUOTA_PATH}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(quota, f)
+    os.replace(tmp, QUOTA_PATH)
+
+
+def plan_request_budget(quota, daily_limit, burst):
+    # Pace usage across the day: by now we may have spent our share of the day's quota,
+    # plus enough burst for one full refresh so the first run of the day is never starved
+    now = datetime.now()
+    day_fraction = (now - now.replace(hour=0, minute=0, second=0, microsecond=0)).total_seconds() / 86400
+    paced_limit = int(daily_limit * day_fraction) + burst
+    remaining = daily_limit - quota["used"]
+    return max(0, min(remaining, paced_limit - quota["used"]))
+
+
+def read_cache_payload(cache_path):
+    # Cached payload for one symbol, or None if missing/unreadable
+    try:
+        with open(cache_path, "r") as f:
+            payload = json.load(f)
+        if (
+            isinstance(payload, dict)
+            and "timestamp" in payload
+            and isinstance(payload["timestamp"], (int, float))
+        ):
+            return payload
+    except Exception:
+        # Any read/parse error -> ignore cache and refetch
+        pass
+    return None
+
+
+def write_cache(symbol, range_in_days, fetched_data):
+    # Only write cache if fetched data is structurally valid
+    if not (
+        isinstance(fetched_data, dict)
+        and "current_price" in fetched_data
+        and isinstance(fetched_data["current_price"], (int, float))
+    ):
+        return None
+
+    tmp = os.path.join(CACHE_DIR, f"{symbol}.json.{os.getpid()}.tmp")
+    final = os.path.join(CACHE_DIR, f"{symbol}.json")
+
+    # Payload includes metadata for staleness and debugging
+    payload = {
+        "symbol": symbol,
+        "range_in_days": range_in_days,
+        "timestamp": int(time.time()),
+        "data": fetched_data,
+    }
+
+    # Atomic write to avoid corrupting existing cache
+    with open(tmp, "w") as f:
+        json.dump(payload, f)
+    os.replace(tmp, final)
+    return payload
+
+
+def update_index(symbols, updated_payloads):
+    # Merge this run's payloads into the consolidated index (readers tell versions apart by its inode and mtime).
+    # Symbols missing from the index (e.g. first run after upgrading) are seeded from their own files.
+    index = {"symbols": {}}
+    try:
+        with open(INDEX_PATH, "r") as f:
+            loaded = json.load(f)
+        if isinstance(loaded, dict) and isinstance(loaded.get("symbols"), dict):
+            index = loaded
+    except Exception:
+        # Missing or corrupt index -> rebuild it
+        pass
+
+    changed = not os.path.exists(INDEX_PATH)
+    for symbol in symbols:
+        payload = updated_payloads.get(symbol)
+        if payload is None and symbol not in index["symbols"]:
+            payload = read_cache_payload(os.path.join(CACHE_DIR, f"{symbol}.json"))
+        if payload is not None:
+            index["symbols"][symbol] = payload
+            changed = True
+
+    if not changed:
+        return
+
+    tmp = f"{INDEX_PATH}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"symbols": index["symbols"]}, f)
+    os.replace(tmp, INDEX_PATH)
+
+
+def refresh_symbols(args, symbols, pending, health):
+    # Spend this run's share of the daily quota on the pending symbols; returns the new payloads
+    from bar_store import BarStore
+
+    labels = horizons.resolve(args.horizons, args.range_in_days)
+    updated_payloads = {}
+    outcomes = {}
+    quota = load_quota()
+    budget = plan_request_budget(quota, args.daily_limit, len(symbols))
+
+    with transport.open_session(args.transport) as session:
+        # --- Bulk mode: one request covers up to BULK_MAX_SYMBOLS intraday quotes ---
+        # (free keys only learn once a day that it is premium-only, see fetch_bulk_quotes)
+        if args.bulk and not labels and not quota.get("bulk_unavailable"):
+            chunks = [pending[start:start + BULK_MAX_SYMBOLS] for start in range(0, len(pending), BULK_MAX_SYMBOLS)]
+            for chunk in chunks:
+                if budget < 1:
+                    break
+                quotes = fetch_bulk_quotes(args.api_key, chunk, session)
+                if quotes is None:
+                    # Not on this key's plan -- per-symbol calls for the rest of the day (the quota file resets daily)
+                    quota["bulk_unavailable"] = True
+                record_requests(quota)
+                budget -= 1
+                if not quotes:
+                    # Bulk endpoint unavailable or failing -- fall back to per-symbol calls
+                    break
+                for symbol in chunk:
+                    payload = write_cache(symbol, args.range_in_days, quotes.get(symbol))
+                    if payload:
+                        updated_payloads[symbol] = payload
+                pending = [symbol for symbol in pending if symbol not in updated_payloads]
+
+        # --- Per-symbol fallback, limited to what the daily plan allows ---
+        if len(pending) > budget:
+            log_error(f"Daily quota plan allows {budget} of {len(pending)} pending requests ({quota['used']}/{args.daily_limit} used today)")
+
+        store = BarStore() if labels else None
+
+        for i, symbol in enumerate(pending[:budget]):
+            # Fetch either intraday or historical data depending on range
+            fetched_data = (
+                fetch_intraday_data(args.api_key, symbol, session=session)
+                if not labels
+                else fetch_historical_data(args.api_key, symbol, labels, store, session)
+            )
+            record_requests(quota)
+            payload = write_cache(symbol, args.range_in_days, fetched_data)
+            if payload:
+                updated_payloads[symbol] = payload
+            outcomes[symbol] = payload is not None
+
+            # Rate-limit delay between symbols
+            if i < min(budget, len(pending)) - 1:
+                time.sleep(API_DELAY_SECONDS)
+
+    # Failing symbols back off; a refresh where everything failed counts against the provider's circuit breaker
+    health.record_refresh(outcomes)
+    health.save()
+    return updated_payloads
+
+
+def update_caches(args, symbols):
+    # Refresh the symbols that are due and publish the index (called with the refresh lock held)
+    # --- No-thrash protection: only symbols whose cache is missing or due by the market calendar need the API ---
+    cache_ages = {}
+    now = time.time()
+    for symbol in symbols:
+        payload = read_cache_payload(os.path.join(CACHE_DIR, f"{symbol}.json"))
+        if payload is not None:
+            due_at = payload["timestamp"] + NO_THRASH_SECONDS
+            if not args.always_refresh:
+                due_at = market_calendar.next_refresh(symbol, payload["timestamp"], NO_THRASH_SECONDS, now)
+        if (
+            payload is None
+            or now >= due_at
+            # A horizon that was added since the last fetch is missing from the cached comparisons
+            or args.horizons and not set(args.horizons) <= set((payload.get("data") or {}).get("compare_prices") or {})
+        ):
+            cache_ages[symbol] = payload["timestamp"] if payload else 0
+        else:
+            # Served from the per-symbol cache this run
+            fetcher = "fetch_historical_data" if horizons.resolve(args.horizons, args.range_in_days) else "fetch_intraday_data"
+            with metrics.FetchTimer(BAR_SOURCE, fetcher, symbol) as timer:
+                timer.cache(True)
+
+    # Stalest first, so symbols late in the list are not starved when the budget runs short
+    pending = sorted(cache_ages, key=lambda symbol: cache_ages[symbol])
+
+    # Leave a failing API alone: nothing while its circuit is open, and failing symbols only after their backoff.
+    # The processor keeps rendering the cached values (turning stale) meanwhile.
+    health = FetchHealth(BAR_SOURCE)
+    if pending and not health.provider_available():
+        log_error(f"Alpha Vantage kept failing, not retrying before {datetime.fromtimestamp(health.state['provider']['retry_at']):%H:%M:%S}")
+        pending = []
+    pending = [symbol for symbol in pending if health.symbol_available(symbol)]
+
+    updated_payloads = refresh_symbols(args, symbols, pending, health) if pending else {}
+    update_index(symbols, updated_payloads)
+    metrics.flush()
+
+
 def main():
     # Parse command-line arguments
     parser = argparse.ArgumentParser()
     parser.add_argument("--api_key", required=True)
     parser.add_argument("--symbols", required=True)
     parser.add_argument("--range_in_days", type=int, default=0)
+    parser.add_argument("--horizons", default=None, type=horizons.parse_horizons, help="Comma-separated comparisons stored from one daily-series request, e.g. 1d,7d,30d,ytd (replaces --range_in_days)")
+    parser.add_argument("--bulk", action="store_true", help="Try one REALTIME_BULK_QUOTES request for all intraday symbols first (premium keys)")
+    parser.add_argument("--proxy", default=None, help="Fetch through a shared quote_proxy.py, e.g. http://quotes.lan:8765/<token> (default is to call the API directly)")
+    parser.add_argument("--transport", default=transport.DEFAULT_TRANSPORT, choices=transport.TRANSPORTS, help=f"HTTP client; stdlib starts faster, requests honors proxy settings (default is {transport.DEFAULT_TRANSPORT})")
+    parser.add_argument("--always_refresh", action="store_true", help="Re-query hourly even while the stock market is closed")
+    parser.add_argument("--daily_limit", type=int, default=DAILY_REQUEST_LIMIT, help="Requests allowed per day by your API plan")
     args = parser.parse_args()
 
+    # A shared quote_proxy.py serves the same paths, so only the base URL changes
+    if args.proxy:
+        global ALPHAVANTAGE_API_URL
+        ALPHAVANTAGE_API_URL = f"{args.proxy.rstrip('/')}/alphavantage/query"
+
     # Normalize and split ticker symbols
     symbols = args.symbols.strip().upper().split(",")
 
     # Ensure cache directory exists
     os.makedirs(CACHE_DIR, exist_ok=True)
 
-    for i, symbol in enumerate(symbols):
-        cache_path = os.path.join(CACHE_DIR, f"{symbol}.json")
-
-        # --- No-thrash protection: skip API call if cache is still fresh ---
-        if os.path.exists(cache_path):
-            try:
-                with open(cache_path, "r") as f:
-                    payload = json.load(f)
-
-                if (
-                    isinstance(payload, dict)
-                    and "timestamp" in payload
-                    and isinstance(payload["timestamp"], (int, float))
-                    and (time.time() - payload["timestamp"]) < NO_THRASH_SECONDS
-                ):
-                    # Cached data is recent enough -> skip querying AlphaVantage
-                    continue
-            except Exception:
-                # Any read/parse error -> ignore cache and refetch
-                pass
-
-        # Fetch either intraday or historical data depending on range
-        fetched_data = (
-            fetch_intraday_data(args.api_key, symbol)
-            if args.range_in_days < 1
-            else fetch_historical_data(args.api_key, symbol, args.range_in_days)
-        )
-
-        # Only write cache if fetched data is structurally valid
-        if (
-            isinstance(fetched_data, dict)
-            and "current_price" in fetched_data
-            and isinstance(fetched_data["current_price"], (int, float))
-        ):
-            tmp = os.path.join(CACHE_DIR, f"{symbol}.json.tmp")
-            final = os.path.join(CACHE_DIR, f"{symbol}.json")
-
-            # Payload includes metadata for staleness and debugging
-            payload = {
-                "symbol": symbol,
-                "range_in_days": args.range_in_days,
-                "timestamp": int(time.time()),
-                "data": fetched_data,
-            }
-
-            # Atomic write to avoid corrupting existing cache
-            with open(tmp, "w") as f:
-                json.dump(payload, f)
-            os.replace(tmp, final)
-
-        # Rate-limit delay between symbols
-        if i < len(symbols) - 1:
-            time.sleep(API_DELAY_SECONDS)
+    # One run at a time across processes.  A run that waited behind another finds the payloads it just
+    # wrote fresh, so it reuses them instead of asking the API again.
+    with single_flight.Flight(REFRESH_LOCK_PATH, REFRESH_LEASE_SECONDS) as flight:
+        if not flight.acquired:
+            log_error("An earlier refresh is still running, leaving the caches to it")
+            return
+        update_caches(args, symbols)
 
 
 if __name__ == "__main__":
     main()
-
@@ -1,108 +1,341 @@
 #!/usr/bin/env python3
 
-import requests
+import os
+import sys
+import time
+import fcntl
+import select
 import argparse
+import threading
 from datetime import datetime, timedelta
+from quote_cache import FetchHealth, LastGoodCache
+from rate_limiter import RateLimiter, REQUESTS_PER_MINUTE
+import horizons
+import market_calendar
+import transport
+import metrics
+import single_flight
 
+# requests, the thread pool, the bar store and socketserver are imported where they are used,
+# so a run that only renders cached values starts without loading them
 
-def fetch_current_stock_data(api_key, symbol):
-    url = "https://finnhub.io/api/v1/quote"
-    params = {
-        'symbol': symbol,
-        'token': api_key
-    }
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            return {
-                "symbol": symbol,
-                "current_price": data.get("c"),
-                "open_price": data.get("o")
-            }
-        else:
-            print(f"Error: Failed to fetch current data for {symbol} (HTTP {response.status_code})")
-            return None
-    except requests.RequestException as e:
-        print(f"Error: Failed to get current stock data for {symbol} - {e}")
-        return None
+# Last good result per symbol, served (marked stale if old) whenever a refresh is slow or failing
+CACHE_DIR = os.path.expanduser("~/.cache/mgconky/stocks_finnhub/")
 
+# Held while a refresh runs, so a slow API never piles up overlapping refreshes
+REFRESH_LOCK_PATH = os.path.join(CACHE_DIR, "refresh.lock")
 
-def fetch_current_crypto_data(api_key, symbol):
-    url = "https://finnhub.io/api/v1/crypto/candle"
-    current_time = int(datetime.now().timestamp())
+# A refresh holding the lock longer than this is presumed hung and no longer waited for
+REFRESH_LEASE_SECONDS = 120
+
+# Default file the daemon publishes the rendered Conky block to (read with ${catp ...})
+DAEMON_OUTPUT_PATH = os.path.expanduser("~/.cache/mgconky/stocks_finnhub.txt")
+
+# Provider name used for this fetcher's rows in the shared bar store
+BAR_SOURCE = "finnhub"
+
+# FinnHub REST endpoint (overridable, e.g. to point the benchmarks at a local mock server)
+FINNHUB_API_URL = os.environ.get("MGCONKY_FINNHUB_URL", "https://finnhub.io/api/v1")
+
+# FinnHub trade stream (one WebSocket for all symbols)
+FINNHUB_WS_URL = "wss://ws.finnhub.io"
+
+
+class RateLimitedSession:
+    """Wraps a session so every GET spends a limiter token first."""
+
+    def __init__(self, session, limiter):
+        self.session = session
+        self.limiter = limiter
+
+    def get(self, *args, **kwargs):
+        self.limiter.acquire()
+        return self.session.get(*args, **kwargs)
+
+
+def fetch_current_stock_data(api_key, symbol, session=None):
+    url = f"{FINNHUB_API_URL}/quote"
     params = {
         'symbol': symbol,
-        'resolution': '1',  # 1-minute resolution
-        'from': current_time - 60,  # Last minute
-        'to': current_time,
         'token': api_key
     }
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("s") == "ok" and "c" in data:
+    session = session or transport.default_session()
+    with metrics.FetchTimer(BAR_SOURCE, "fetch_current_stock_data", symbol) as timer:
+        try:
+            response = timer.get(session, url, params=params, timeout=10)
+            if response.status_code == 200:
+                data = timer.json(response)
                 return {
                     "symbol": symbol,
-                    "current_price": data["c"][-1],  # Last closing price
-                    "open_price": data["o"][-1]  # Last opening price
+                    "current_price": data.get("c"),
+                    "open_price": data.get("o")
                 }
             else:
-                print(f"Error: Crypto data not OK for {symbol}")
+                print(f"Error: Failed to fetch current data for {symbol} (HTTP {response.status_code})")
                 return None
-        else:
-            print(f"Error: Failed to fetch crypto data for {symbol} (HTTP {response.status_code})")
+        except transport.request_errors() as e:
+            print(f"Error: Failed to get current stock data for {symbol} - {e}")
             return None
-    except requests.RequestException as e:
-        print(f"Error: Failed to get crypto data for {symbol} - {e}")
-        return None
 
 
-def fetch_historical_data(api_key, symbol, range_in_days):
-    url = "https://finnhub.io/api/v1/stock/candle" if ':' in symbol else "https://finnhub.io/api/v1/crypto/candle"
-    end_time = int(datetime.now().timestamp())
-    start_time = int((datetime.now() - timedelta(days=range_in_days)).timestamp())
+def fetch_current_crypto_data(api_key, symbol, session=None):
+    url = f"{FINNHUB_API_URL}/crypto/candle"
+    current_time = int(datetime.now().timestamp())
     params = {
         'symbol': symbol,
-        'resolution': 'D',  # Daily candles
-        'from': start_time,
-        'to': end_time,
+        'resolution': '1',  # 1-minute resolution
+        'from': current_time - 60,  # Last minute
+        'to': current_time,
         'token': api_key
     }
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("s") == "ok":
-                return {
-                    "symbol": symbol,
-                    "timestamps": data["t"],
-                    "close_prices": data["c"]
-                }
+    session = session or transport.default_session()
+    with metrics.FetchTimer(BAR_SOURCE, "fetch_current_crypto_data", symbol) as timer:
+        try:
+            response = timer.get(session, url, params=params, timeout=10)
+            if response.status_code == 200:
+                data = timer.json(response)
+                if data.get("s") == "ok" and "c" in data:
+                    return {
+                        "symbol": symbol,
+                        "current_price": data["c"][-1],  # Last closing price
+                        "open_price": data["o"][-1]  # Last opening price
+                    }
+                else:
+                    print(f"Error: Crypto data not OK for {symbol}")
+                    return None
             else:
-                print(f"Error: Historical data not ok for {symbol}")
+                print(f"Error: Failed to fetch crypto data for {symbol} (HTTP {response.status_code})")
                 return None
-        else:
-            print(f"Error: Failed to fetch historical data for {symbol} (HTTP {response.status_code})")
+        except transport.request_errors() as e:
+            print(f"Error: Failed to get crypto data for {symbol} - {e}")
             return None
-    except requests.RequestException as e:
-        print(f"Error: Failed to get historical stock data for {symbol} - {e}")
-        return None
 
-def main():
-    # Parse command-line arguments
-    parser = argparse.ArgumentParser(description="Fetch stock data from FinnHub.")
-    parser.add_argument("--api_key", required=True, help="Your personal FinnHub API key")
-    parser.add_argument("--symbols", required=True, help="Stock symbols (comma separated) to fetch")
-    parser.add_argument("--range_in_days", default=0, type=int, help="Number of days to compare against (optional, default is 0)")
-    parser.add_argument("--price_dec_places", default=0, type=int, help="Number of decimal places for prices (default is 0)")
-    parser.add_argument("--percent_dec_places", default=1, type=int, help="Number of decimal places for percentages (default is 1)")
-    args = parser.parse_args()
 
+def fetch_historical_data(api_key, symbol, labels, session=None, store=None):
+    # Daily closes accumulate in the local bar store; only candles newer than the last stored date are requested.
+    # One candle request covers every horizon, each then looked up by binary search over the stored dates.
+    from bar_store import BarStore
+
+    session = session or transport.default_session()
+    store = store or BarStore()
+    targets = horizons.target_dates(labels)
+    # Reach a few days past the oldest target, so a weekend or holiday target still finds the session before it
+    earliest = (datetime.strptime(min(targets.values()), "%Y-%m-%d") - timedelta(days=horizons.MAX_GAP_DAYS)).strftime("%Y-%m-%d")
+    today = datetime.now().strftime("%Y-%m-%d")
+
+    with metrics.FetchTimer(BAR_SOURCE, "fetch_historical_data", symbol) as timer:
+        last_stored = store.last_date(BAR_SOURCE, symbol)
+        covered = last_stored is not None and store.has_bars_on_or_before(BAR_SOURCE, symbol, min(targets.values()))
+        # Newest bar the targets need; stocks do not trade at weekends or on exchange holidays, crypto does
+        latest_needed = max(targets.values())
+        if not market_calendar.is_crypto(symbol):
+            latest_needed = market_calendar.last_trading_day_on_or_before(latest_needed)
+        # Cache hit when the bar store already spans every target date (no request needed)
+        timer.cache(covered and last_stored >= latest_needed)
+        if not covered or last_stored < latest_needed:
+            url = f"{FINNHUB_API_URL}/crypto/candle" if ':' in symbol else f"{FINNHUB_API_URL}/stock/candle"
+            end_time = int(datetime.now().timestamp())
+            start_time = int(datetime.strptime(earliest, "%Y-%m-%d").timestamp())
+            if covered:
+                start_time = max(start_time, int((datetime.strptime(last_stored, "%Y-%m-%d") + timedelta(days=1)).timestamp()))
+            params = {
+                'symbol': symbol,
+                'resolution': 'D',  # Daily candles
+                'from': start_time,
+                'to': end_time,
+                'token': api_key
+            }
+            try:
+                response = timer.get(session, url, params=params, timeout=10)
+                if response.status_code == 200:
+                    data = timer.json(response)
+                    if data.get("s") == "ok":
+                        # Today's candle is still moving, so it is not stored
+                        store.append(BAR_SOURCE, symbol, (
+                            (datetime.fromtimestamp(ts).strftime("%Y-%m-%d"), price)
+                            for ts, price in zip(data["t"], data["c"])
+                            if datetime.fromtimestamp(ts).strftime("%Y-%m-%d") < today
+                        ))
+                    elif data.get("s") != "no_data" or last_stored is None:
+                        # "no_data" just means nothing new since the last stored bar
+                        print(f"Error: Historical data not ok for {symbol}")
+                        return None
+                else:
+                    print(f"Error: Failed to fetch historical data for {symbol} (HTTP {response.status_code})")
+                    return None
+            except transport.request_errors() as e:
+                print(f"Error: Failed to get historical stock data for {symbol} - {e}")
+                return None
+
+    # Closing price of the nearest trading day at or before every target date
+    dates, closes = store.closes_since(BAR_SOURCE, symbol, earliest)
+    return {
+        "symbol": symbol,
+        "target_dates": targets,
+        "close_prices": horizons.closes_at(dates, closes, targets)
+    }
+
+def fetch_symbol(args, symbol, session, store=None):
+    # All network work for one symbol (crypto symbols have a colon in them, i.e. BINANCE:BTCUSDT; COINBASE:BTCUSD)
+    current_data = fetch_current_crypto_data(args.api_key, symbol, session) if ':' in symbol else fetch_current_stock_data(args.api_key, symbol, session)
+    historical_data = None
+    if current_data and compare_horizons(args):
+        # Fetch historical data if there is anything to compare against
+        historical_data = fetch_historical_data(args.api_key, symbol, compare_horizons(args), session, store)
+    return current_data, historical_data
+
+
+def compare_horizons(args):
+    return horizons.resolve(args.horizons, args.range_in_days)
+
+
+def parse_symbols(args):
     # Split symbols
-    symbols = args.symbols.strip().upper().split(",")
+    return args.symbols.strip().upper().split(",")
+
+
+def fetch_all(args, symbols, session, limiter=None):
+    # Fetch all symbols in parallel; map() hands results back in the original symbol order
+    from concurrent.futures import ThreadPoolExecutor
+    from bar_store import BarStore
+
+    limited_session = RateLimitedSession(session, limiter or RateLimiter(args.requests_per_minute))
+    store = BarStore() if compare_horizons(args) else None
+    with ThreadPoolExecutor(max_workers=max(1, min(args.max_workers, len(symbols)))) as executor:
+        return list(executor.map(lambda symbol: fetch_symbol(args, symbol, limited_session, store), symbols))
+
+
+def due_symbols(args, symbols, health, fresh_since=None):
+    # Symbols worth a request right now: none while the provider's circuit is open, otherwise those not backing
+    # off whose market has traded since their last good value (closed markets are served from the cache).
+    # Values stored at or after fresh_since were just fetched by a concurrent refresh and are reused.
+    if not health.provider_available():
+        return []
+    cache = LastGoodCache(CACHE_DIR)
+    now = time.time()
+    due = []
+    for symbol in symbols:
+        if not health.symbol_available(symbol):
+            continue
+        entry = cache.load(symbol)
+        if entry is not None and entry.get("horizons") == compare_horizons(args):
+            if fresh_since and entry["timestamp"] >= fresh_since:
+                continue
+            # Every run while the market is open, once after the close, then not before the next open
+            if not args.always_refresh and market_calendar.next_refresh(symbol, entry["timestamp"], 0, now) > now:
+                continue
+        due.append(symbol)
+    return due
+
+
+def refresh_cache(args, symbols, session=None, limiter=None):
+    # One refresh at a time across processes (execpi runs, the daemon, several Conky instances).
+    # A run that had to wait behind another one only fetches what that one did not.
+    with single_flight.Flight(REFRESH_LOCK_PATH, REFRESH_LEASE_SECONDS) as flight:
+        if flight.acquired:
+            fetch_into_cache(args, symbols, session, limiter, flight.shared_since)
+
+
+def fetch_into_cache(args, symbols, session=None, limiter=None, fresh_since=None):
+    # Fetch what the health tracker allows and keep every good result as the symbol's last good value
+    health = FetchHealth(BAR_SOURCE)
+    due = due_symbols(args, symbols, health, fresh_since)
+    if not due:
+        return
 
+    if session is None:
+        with transport.open_session(args.transport) as session:
+            return fetch_into_cache(args, symbols, session, limiter, fresh_since)
+
+    cache = LastGoodCache(CACHE_DIR)
+    outcomes = {}
+    for symbol, (current_data, historical_data) in zip(due, fetch_all(args, due, session, limiter)):
+        outcomes[symbol] = current_data is not None and (not compare_horizons(args) or historical_data is not None)
+        if outcomes[symbol]:
+            cache.store(symbol, {
+                "horizons": compare_horizons(args),
+                "current_data": current_data,
+                "historical_data": historical_data,
+            })
+    health.record_refresh(outcomes)
+    health.save()
+
+
+def cached_results(args, symbols):
+    # (current_data, historical_data) per symbol from the last good values, plus the symbols whose value is stale
+    cache = LastGoodCache(CACHE_DIR)
+    now = time.time()
+    results = []
+    stale = set()
+    for symbol in symbols:
+        entry = cache.load(symbol)
+        if entry is None or entry.get("horizons") != compare_horizons(args):
+            results.append((None, None))
+            continue
+        results.append((entry.get("current_data"), entry.get("historical_data")))
+        # Stale --stale_seconds after the fetch (or the next open after it), never while the market is closed
+        stale_at = entry["timestamp"] + args.stale_seconds
+        if not args.always_refresh:
+            stale_at = market_calendar.stale_at(symbol, entry["timestamp"], args.stale_seconds, now)
+        if now > stale_at:
+            stale.add(symbol)
+    return results, stale
+
+
+def render_cached(args, symbols):
+    results, stale = cached_results(args, symbols)
+    with metrics.FetchTimer(BAR_SOURCE, "render_output") as timer, timer.stage("render"):
+        block = render_output(args, symbols, results, stale)
+    metrics.flush()
+    return block
+
+
+def build_output(args, session=None, limiter=None):
+    # Blocking refresh, then render (daemon mode, where nobody waits on the result, and --blocking)
+    symbols = parse_symbols(args)
+    refresh_cache(args, symbols, session, limiter)
+    return render_cached(args, symbols)
+
+
+def build_output_within_deadline(args):
+    # Stale-while-revalidate for execpi: the refresh runs in a detached child.  If it finishes within
+    # --deadline the fresh values are rendered, otherwise the last good values are rendered right away
+    # (stale ones marked) and the child carries on updating the cache for the next run.
+    symbols = parse_symbols(args)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    if not due_symbols(args, symbols, FetchHealth(BAR_SOURCE)):
+        # Market closed, circuit open or every symbol backing off -- nothing to wait for
+        return render_cached(args, symbols)
+
+    read_fd, write_fd = os.pipe()
+    if os.fork() == 0:
+        os.close(read_fd)
+        os.setsid()
+        # Let go of Conky's pipe, so it is not kept waiting for this process
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        os.close(devnull)
+        try:
+            # Behind a refresh from an earlier run this waits for it (the parent renders its results if they
+            # arrive within --deadline) and then only fetches what that run left due
+            refresh_cache(args, symbols)
+            metrics.flush()
+        finally:
+            try:
+                os.write(write_fd, b"done")
+            except OSError:
+                # The parent gave up waiting and is gone
+                pass
+            os._exit(0)
+
+    os.close(write_fd)
+    select.select([read_fd], [], [], args.deadline)
+    os.close(read_fd)
+    return render_cached(args, symbols)
+
+
+def render_output(args, symbols, results, stale=frozenset()):
     # Use a list to build the final output string
     output = []
 
@@ -115,30 +348,43 @@ def main():
     line_tab1_offset = "${goto 25}"
     line_tab2_offset = "${goto 90}"
     line_tab3_offset = "${alignr}" # Could also replace this with goto 120 if you don't like the right alignment
+    horizon_column_width = 7  # Characters per --horizons column (right-aligned in the monospace font)
     historical_data_exists = False
 
-    # Iterate symbols (crypto symbols have a colon in them, i.e. BINANCE:BTCUSDT; COINBASE:BTCUSD)
-    for symbol in symbols:
-        current_data = fetch_current_crypto_data(args.api_key, symbol) if ':' in symbol else fetch_current_stock_data(args.api_key, symbol)
+    # Iterate symbols
+    for symbol, (current_data, historical_data) in zip(symbols, results):
+        # Symbol turns red (color_bad) when it shows a last good value that has gone stale
+        symbol_color = color_bad if symbol in stale else color_label
         if current_data:
             current_price = current_data['current_price']
-            if args.range_in_days > 0:
-                # Fetch historical data if range_in_days > 0
-                historical_data = fetch_historical_data(args.api_key, symbol, args.range_in_days)
+            if args.horizons:
+                # One percent-change column per horizon, all from the same stored series
                 if historical_data:
                     historical_data_exists = True
-                    # Find the closing price for exactly X days ago
-                    target_date = (datetime.now() - timedelta(days=args.range_in_days)).strftime("%Y-%m-%d")
-                    timestamps = historical_data["timestamps"]
-                    close_prices = historical_data["close_prices"]
-
-                    # Convert timestamps to dates and find the target date's index
-                    date_to_close_price = {
-                        datetime.fromtimestamp(ts).strftime("%Y-%m-%d"): price
-                        for ts, price in zip(timestamps, close_prices)
-                    }
-
-                    historical_closing_price = date_to_close_price.get(target_date, None)
+                    horizon_changes = horizons.changes(current_price, historical_data["close_prices"])
+                    columns = []
+                    for label in args.horizons:
+                        if horizon_changes.get(label) is None:
+                            columns.append(f"{color_value}{'--':>{horizon_column_width}}")
+                            continue
+                        price_difference, percent_change = horizon_changes[label]
+                        color_dynamic = (
+                            color_good if round(price_difference, args.price_dec_places) > 0
+                            else color_bad if round(price_difference, args.price_dec_places) < 0
+                            else color_value
+                        )
+                        percent_text = f"{round(percent_change, args.percent_dec_places):+.{args.percent_dec_places}f}%"
+                        columns.append(f"{color_dynamic}{percent_text:>{horizon_column_width}}")
+                    output.append(
+                        f"{line_tab1_offset}{symbol_color}{symbol}: {line_tab2_offset}{color_value}{round(current_price, args.price_dec_places):.{args.price_dec_places}f} "
+                        f"{line_tab3_offset}{''.join(columns)}"
+                    )
+                else:
+                    output.append(f"{symbol}: Error fetching historical data")
+            elif args.range_in_days > 0:
+                if historical_data:
+                    historical_data_exists = True
+                    historical_closing_price = historical_data["close_prices"].get(f"{args.range_in_days}d")
                     if historical_closing_price is not None:
                         # Calculate difference in value from current price to historical close
                         price_difference = current_price - historical_closing_price
@@ -149,7 +395,7 @@ def main():
                             else color_value
                         )
                         output.append(
-                            f"{line_tab1_offset}{color_label}{symbol}: {line_tab2_offset}{color_value}{round(current_price, args.price_dec_places):.{args.price_dec_places}f} "
+                            f"{line_tab1_offset}{symbol_color}{symbol}: {line_tab2_offset}{color_value}{round(current_price, args.price_dec_places):.{args.price_dec_places}f} "
                             f"{line_tab3_offset}{color_dynamic}{round(price_difference, args.price_dec_places):+.{args.price_dec_places}f} "                        
                             f"({round(percent_change, args.percent_dec_places):+.{args.percent_dec_places}f}%)"
                         )
@@ -172,7 +418,7 @@ def main():
                         else color_value
                     )
                     output.append(
-                        f"{line_tab1_offset}{color_label}{symbol}: {line_tab2_offset}{color_value}{round(current_price, args.price_dec_places):.{args.price_dec_places}f} "
+                        f"{line_tab1_offset}{symbol_color}{symbol}: {line_tab2_offset}{color_value}{round(current_price, args.price_dec_places):.{args.price_dec_places}f} "
                         f"{line_tab3_offset}{color_dynamic}{round(intraday_change, args.price_dec_places):+.{args.price_dec_places}f} "
                         f"({round(intraday_percent_change, args.percent_dec_places):+.{args.percent_dec_places}f}%)"
                     )
@@ -185,9 +431,191 @@ def main():
 
     # Join all parts of the output and print it
     header_label = f"{args.range_in_days} Day" if historical_data_exists else "Intraday"
+    if args.horizons and historical_data_exists:
+        header_label = "".join(f"{label.upper():>{horizon_column_width}}" for label in args.horizons)
     header_line = f"{line_tab1_offset}{color_header}Ticker{line_tab2_offset}Price ($$){line_tab3_offset}{header_label}{color_label}"
     return header_line + "\n" + f"{line_tab1_offset}{color_header}${{voffset -5}}${{hr 1}}" + "\n" + "\n".join(output)
 
+
+def publish_output(path, text):
+    # Atomic write so ${catp} never sees a half-written block (per-process temp name, so writers never share one)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text + "\n")
+    os.replace(tmp, path)
+
+
+def serve_socket(socket_path):
+    import socketserver
+
+    class LatestBlockHandler(socketserver.BaseRequestHandler):
+        # Every connection just receives the most recently rendered block and is closed
+        def handle(self):
+            self.request.sendall((self.server.latest_block + "\n").encode())
+
+    # Remove a leftover socket from a previous run before binding
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, LatestBlockHandler)
+    server.daemon_threads = True
+    server.latest_block = ""
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def detach():
+    # Classic double fork so Conky's execi returns immediately and the daemon outlives it
+    if os.fork() > 0:
+        sys.exit(0)
+    os.setsid()
+    if os.fork() > 0:
+        os._exit(0)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    os.close(devnull)
+
+
+def run_daemon(args):
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    # Only one daemon per output file -- later launches (e.g. from execi) exit quietly
+    lock_file = open(f"{args.output}.lock", "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return
+
+    if not args.foreground:
+        detach()
+
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+
+    server = serve_socket(args.socket) if args.socket else None
+
+    # The request budget is per minute, so the bucket must outlive a single refresh
+    limiter = RateLimiter(args.requests_per_minute)
+
+    # One pooled session keeps TLS connections to FinnHub alive between refreshes
+    with transport.open_session(args.transport) as session:
+        if args.stream:
+            run_stream(args, session, limiter, server)
+            return
+
+        while True:
+            started = time.monotonic()
+            try:
+                block = build_output(args, session, limiter)
+            except Exception:
+                # Keep showing the last published block if a refresh blows up
+                block = None
+            if block is not None:
+                publish_output(args.output, block)
+                if server:
+                    server.latest_block = block
+            time.sleep(max(0, args.interval - (time.monotonic() - started)))
+
+
+def run_stream(args, session, limiter, server):
+    # Prices come from the trade stream; REST is only used for the comparison baseline
+    from finnhub_stream import QuoteStream
+
+    symbols = parse_symbols(args)
+    stream = QuoteStream(args.ws_url, args.api_key, symbols, record_path=args.record)
+    stream.start()
+
+    baseline = None
+    baseline_time = 0
+    published_version = None
+
+    while True:
+        # Refresh open/historical prices (and prices for symbols with no trades yet) now and then
+        if baseline is None or time.monotonic() - baseline_time >= args.baseline_interval:
+            try:
+                baseline = fetch_all(args, symbols, session, limiter)
+                baseline_time = time.monotonic()
+                published_version = None
+            except Exception:
+                # Try again on the next pass
+                pass
+
+        prices, version = stream.snapshot()
+        if baseline is not None and version != published_version:
+            results = []
+            for symbol, (current_data, historical_data) in zip(symbols, baseline):
+                if symbol in prices:
+                    current_data = dict(current_data or {"symbol": symbol, "open_price": None}, current_price=prices[symbol])
+                results.append((current_data, historical_data))
+
+            with metrics.FetchTimer(BAR_SOURCE, "render_output") as timer, timer.stage("render"):
+                block = render_output(args, symbols, results)
+            publish_output(args.output, block)
+            if server:
+                server.latest_block = block
+            published_version = version
+            metrics.flush()
+
+        # Sleep until trades arrive, then let a burst collect so it becomes one render
+        stream.wait_for_update(timeout=60)
+        time.sleep(args.coalesce_seconds)
+
+
+def main():
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Fetch stock data from FinnHub.")
+    parser.add_argument("--api_key", required=True, help="Your personal FinnHub API key")
+    parser.add_argument("--symbols", required=True, help="Stock symbols (comma separated) to fetch")
+    parser.add_argument("--range_in_days", default=0, type=int, help="Number of days to compare against (optional, default is 0)")
+    parser.add_argument("--horizons", default=None, type=horizons.parse_horizons, help="Comma-separated comparison columns from one candle fetch, e.g. 1d,7d,30d,ytd (replaces --range_in_days; widen the conky for more than two)")
+    parser.add_argument("--price_dec_places", default=0, type=int, help="Number of decimal places for prices (default is 0)")
+    parser.add_argument("--percent_dec_places", default=1, type=int, help="Number of decimal places for percentages (default is 1)")
+    parser.add_argument("--max_workers", default=8, type=int, help="Number of symbols fetched in parallel (default is 8)")
+    parser.add_argument("--requests_per_minute", default=REQUESTS_PER_MINUTE, type=int, help=f"FinnHub request budget per minute (default is {REQUESTS_PER_MINUTE})")
+    parser.add_argument("--daemon", action="store_true", help="Keep running and publish the rendered block to --output every --interval seconds")
+    parser.add_argument("--interval", default=60, type=int, help="Seconds between refreshes in daemon mode (default is 60)")
+    parser.add_argument("--output", default=DAEMON_OUTPUT_PATH, help=f"File the daemon publishes to (default is {DAEMON_OUTPUT_PATH})")
+    parser.add_argument("--socket", default=None, help="Optional Unix socket path that also serves the latest block in daemon mode")
+    parser.add_argument("--foreground", action="store_true", help="Do not detach from the terminal in daemon mode")
+    parser.add_argument("--stream", action="store_true", help="Daemon takes prices from the FinnHub trade WebSocket instead of polling (needs websocket-client)")
+    parser.add_argument("--ws_url", default=FINNHUB_WS_URL, help=f"Trade stream URL, e.g. ws://127.0.0.1:8766 for a local replay_finnhub_feed.py (default is {FINNHUB_WS_URL})")
+    parser.add_argument("--coalesce_seconds", default=1.0, type=float, help="Minimum seconds between published updates in stream mode (default is 1.0)")
+    parser.add_argument("--baseline_interval", default=3600, type=int, help="Seconds between REST refreshes of open/historical prices in stream mode (default is 3600)")
+    parser.add_argument("--record", default=None, help="Append every raw stream message to this JSON-lines file (replayable)")
+    parser.add_argument("--blocking", action="store_true", help="Refresh in this process and wait for it instead of in a detached child (e.g. for benchmarks)")
+    parser.add_argument("--deadline", default=2.0, type=float, help="Seconds to wait for a refresh before showing the last good values instead (default is 2.0)")
+    parser.add_argument("--proxy", default=None, help="Fetch through a shared quote_proxy.py, e.g. http://quotes.lan:8765/<token> (default is to call the API directly)")
+    parser.add_argument("--transport", default=transport.DEFAULT_TRANSPORT, choices=transport.TRANSPORTS, help=f"HTTP client; stdlib starts faster, requests honors proxy settings (default is {transport.DEFAULT_TRANSPORT})")
+    parser.add_argument("--always_refresh", action="store_true", help="Refresh on every run, even while the stock market is closed (crypto symbols always are)")
+    parser.add_argument("--stale_seconds", default=180, type=int, help="Seconds before a last good value is shown as stale (default is 180)")
+    args = parser.parse_args()
+
+    # A shared quote_proxy.py serves the same paths, so only the base URL changes
+    if args.proxy:
+        global FINNHUB_API_URL
+        FINNHUB_API_URL = f"{args.proxy.rstrip('/')}/finnhub"
+
+    # Streaming only makes sense for a long-running process
+    if args.stream:
+        args.daemon = True
+        # Checked before the daemon detaches, while the error can still reach the terminal
+        try:
+            import websocket  # noqa: F401
+        except ImportError:
+            parser.error("--stream needs the websocket-client package (pip install websocket-client)")
+
+    if args.daemon:
+        run_daemon(args)
+        return None
+
+    if args.blocking:
+        return build_output(args)
+    return build_output_within_deadline(args)
+
 if __name__ == "__main__":
-    print(main())
+    result = main()
+    if result is not None:
+        print(result)
 
@@ -0,0 +1,73 @@
+import re
+import argparse
+from bisect import bisect_right
+from datetime import date, timedelta
+
+# Horizon labels: Nd (calendar days), Nw (weeks), Nm (months), Ny (years) and ytd (since the last close of last year)
+HORIZON_PATTERN = re.compile(r"^(\d+)([dwmy])$")
+
+# A close more than this many calendar days before its target date is treated as missing (gap in the data)
+MAX_GAP_DAYS = 10
+
+
+def parse_horizons(text):
+    # "1d,7d,30d,ytd" -> ["1d", "7d", "30d", "ytd"]; raises argparse.ArgumentTypeError (it is an argparse type=) on anything else
+    labels = [label.strip().lower() for label in text.split(",") if label.strip()]
+    for label in labels:
+        if label != "ytd" and not HORIZON_PATTERN.match(label):
+            raise argparse.ArgumentTypeError(f"invalid horizon '{label}' (use e.g. 1d, 7d, 3m, 1y or ytd)")
+    if not labels:
+        raise argparse.ArgumentTypeError("no horizons given")
+    return labels
+
+
+def resolve(labels, range_in_days):
+    # Explicit horizons, else the single --range_in_days comparison as one horizon (none means intraday)
+    if labels:
+        return labels
+    return [f"{range_in_days}d"] if range_in_days > 0 else []
+
+
+def target_date(label, today=None):
+    # Calendar date whose close (or the nearest trading day before it) the horizon compares against
+    today = today or date.today()
+    if label == "ytd":
+        return date(today.year, 1, 1) - timedelta(days=1)
+    count, unit = HORIZON_PATTERN.match(label).groups()
+    count = int(count)
+    if unit == "d":
+        return today - timedelta(days=count)
+    if unit == "w":
+        return today - timedelta(weeks=count)
+
+    # Months and years keep the day of the month, clamped to the end of shorter months
+    year, month = divmod(today.year * 12 + today.month - 1 - count * (12 if unit == "y" else 1), 12)
+    month += 1
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    return date(year, month, min(today.day, (next_month - timedelta(days=1)).day))
+
+
+def target_dates(labels, today=None):
+    # label -> "YYYY-MM-DD"
+    return {label: target_date(label, today).isoformat() for label in labels}
+
+
+def closes_at(dates, closes, targets):
+    # Close of the nearest trading day at or before every target, by binary search over the
+    # ascending "YYYY-MM-DD" dates (weekends and holidays fall back to the previous session)
+    found = {}
+    for label, target in targets.items():
+        i = bisect_right(dates, target)
+        if i and (date.fromisoformat(target) - date.fromisoformat(dates[i - 1])).days <= MAX_GAP_DAYS:
+            found[label] = closes[i - 1]
+        else:
+            found[label] = None
+    return found
+
+
+def changes(current_price, compare_prices):
+    # label -> (absolute change, percent change), or None where there is nothing to compare against
+    return {
+        label: (current_price - price, (current_price - price) / price * 100) if price else None
+        for label, price in compare_prices.items()
+    }
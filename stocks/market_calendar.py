@@ -0,0 +1,188 @@
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as clock
+
+# Regular NYSE/Nasdaq session in exchange time; early closes at 13:00
+EXCHANGE_TIMEZONE = "America/New_York"
+SESSION_OPEN = clock(9, 30)
+SESSION_CLOSE = clock(16, 0)
+EARLY_CLOSE = clock(13, 0)
+
+# One refresh this long after the close picks up the settled closing price; then nothing until the next open
+CLOSE_SETTLE_SECONDS = 15 * 60
+
+# Exchange holidays per year, computed on first use
+_holidays = {}
+
+# ZoneInfo for the exchange, False when the system has no time zone data
+_timezone = None
+
+
+def is_crypto(symbol):
+    # EXCHANGE:PAIR symbols (BINANCE:BTCUSDT, COINBASE:BTCUSD) trade around the clock
+    return ":" in symbol
+
+
+def exchange_timezone():
+    global _timezone
+    if _timezone is None:
+        try:
+            from zoneinfo import ZoneInfo
+            _timezone = ZoneInfo(EXCHANGE_TIMEZONE)
+        except Exception:
+            # No tz database -> treat the market as always open (the old fixed-interval behavior)
+            _timezone = False
+    return _timezone or None
+
+
+def easter(year):
+    # Gregorian Easter Sunday (anonymous Gregorian algorithm)
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def nth_weekday(year, month, weekday, n):
+    # n-th given weekday (0 = Monday) of a month; n = -1 for the last one
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def observed(day):
+    # Saturday holidays close the Friday before, Sunday holidays the Monday after
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def holidays(year):
+    # Full-day NYSE closures (unscheduled closures are not known in advance and not included)
+    if year not in _holidays:
+        days = {
+            nth_weekday(year, 1, 0, 3),   # Martin Luther King Jr. Day
+            nth_weekday(year, 2, 0, 3),   # Washington's Birthday
+            easter(year) - timedelta(days=2),  # Good Friday
+            nth_weekday(year, 5, 0, -1),  # Memorial Day
+            observed(date(year, 7, 4)),   # Independence Day
+            nth_weekday(year, 9, 0, 1),   # Labor Day
+            nth_weekday(year, 11, 3, 4),  # Thanksgiving
+            observed(date(year, 12, 25)),  # Christmas
+        }
+        # New Year's Day on a Saturday is not made up on the Friday before (that is still December)
+        if date(year, 1, 1).weekday() != 5:
+            days.add(observed(date(year, 1, 1)))
+        if year >= 2022:
+            days.add(observed(date(year, 6, 19)))  # Juneteenth
+        _holidays[year] = days
+    return _holidays[year]
+
+
+def last_trading_day_on_or_before(day_text):
+    # "YYYY-MM-DD" rolled back over weekends and exchange holidays to the last session on or before it
+    day = date.fromisoformat(day_text)
+    while day.weekday() >= 5 or day in holidays(day.year):
+        day -= timedelta(days=1)
+    return day.isoformat()
+
+
+def session(day, tz):
+    # (open, close) as aware datetimes, or None when the exchange does not trade that day
+    if day.weekday() >= 5 or day in holidays(day.year):
+        return None
+    early = (
+        (day.month == 7 and day.day == 3)
+        or (day.month == 12 and day.day == 24)
+        or day == nth_weekday(day.year, 11, 3, 4) + timedelta(days=1)
+    )
+    return (
+        datetime.combine(day, SESSION_OPEN, tzinfo=tz),
+        datetime.combine(day, EARLY_CLOSE if early else SESSION_CLOSE, tzinfo=tz),
+    )
+
+
+def is_open(symbol, now=None):
+    tz = exchange_timezone()
+    if is_crypto(symbol) or tz is None:
+        return True
+    local = datetime.fromtimestamp(now or time.time(), tz)
+    hours = session(local.date(), tz)
+    return hours is not None and hours[0] <= local < hours[1]
+
+
+def last_close(local, tz):
+    # Most recent session close at or before `local` (sessions are never more than a few days apart)
+    for back in range(10):
+        hours = session(local.date() - timedelta(days=back), tz)
+        if hours is not None and hours[1] <= local:
+            return hours[1]
+    return None
+
+
+def next_open(local, tz):
+    # First session open after `local`
+    for ahead in range(10):
+        hours = session(local.date() + timedelta(days=ahead), tz)
+        if hours is not None and hours[0] > local:
+            return hours[0]
+    return local + timedelta(days=1)
+
+
+def session_open_from(local, tz):
+    # Open of the session in progress at `local`, or of the next one if the market is closed
+    for ahead in range(10):
+        hours = session(local.date() + timedelta(days=ahead), tz)
+        if hours is not None and hours[1] > local:
+            return hours[0]
+    return local + timedelta(days=1)
+
+
+def next_refresh(symbol, fetched_at, interval, now=None):
+    """Epoch seconds at which a symbol last fetched at `fetched_at` is due again.
+
+    Crypto and open markets: every `interval` seconds.  Closed market: once after the close
+    (CLOSE_SETTLE_SECONDS later, for the final price), then not before the next session opens,
+    which skips nights, weekends and exchange holidays.
+    """
+    now = now or time.time()
+    if is_open(symbol, now):
+        return fetched_at + interval
+
+    tz = exchange_timezone()
+    local = datetime.fromtimestamp(now, tz)
+    close = last_close(local, tz)
+    if close is not None and fetched_at < close.timestamp() + CLOSE_SETTLE_SECONDS:
+        return close.timestamp() + CLOSE_SETTLE_SECONDS
+    return next_open(local, tz).timestamp()
+
+
+def stale_at(symbol, fetched_at, stale_seconds, now=None):
+    """Epoch seconds from which a value fetched at `fetched_at` counts as stale.
+
+    Only trading time ages a value: the clock starts at the fetch or the open of the following
+    session, whichever is later.  A deadline falling while the market is closed moves to the next
+    open, so a value never turns stale while the market is closed.  Use next_refresh() to schedule fetches.
+    """
+    tz = exchange_timezone()
+    if is_crypto(symbol) or tz is None:
+        return fetched_at + stale_seconds
+    now = now or time.time()
+
+    start = max(fetched_at, session_open_from(datetime.fromtimestamp(fetched_at, tz), tz).timestamp())
+    deadline = start + stale_seconds
+    if not is_open(symbol, deadline):
+        deadline = next_open(datetime.fromtimestamp(deadline, tz), tz).timestamp()
+    if deadline <= now and not is_open(symbol, now):
+        # Stale during the last session, but nothing has traded since; it is stale again at the open
+        deadline = next_open(datetime.fromtimestamp(now, tz), tz).timestamp()
+    return deadline
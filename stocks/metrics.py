@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import fcntl
+import threading
+from contextlib import contextmanager
+
+# Rolling log of per-fetch timings (one JSON object per line), shared by every stocks script
+METRICS_PATH = os.path.expanduser("~/.cache/mgconky/metrics.jsonl")
+
+# The log is trimmed back to this many records once it grows past twice that
+MAX_RECORDS = 2000
+
+# Records finished in this process but not yet written
+_pending = []
+_pending_lock = threading.Lock()
+
+
+class FetchTimer:
+    """Timings for one fetch, split into stages, plus its HTTP status and cache hit/miss.
+
+    Stages: wait (rate limiter), dns, request (until response headers), transfer (body),
+    parse (JSON decoding) and render.  dns is only reported by the stdlib transport, for
+    requests that opened a new connection; otherwise the lookup is part of request.  Use as a context manager; the record is queued for
+    flush() when the block exits.
+    """
+
+    def __init__(self, provider, fetcher, symbol=None):
+        self.record = {
+            "ts": round(time.time(), 3),
+            "provider": provider,
+            "fetcher": fetcher,
+            "symbol": symbol,
+            "status": None,
+            "cache": None,
+            "stages": {},
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with _pending_lock:
+            _pending.append(self.record)
+        return False
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        stages = self.record["stages"]
+        stages[name] = round(stages.get(name, 0) + seconds, 6)
+
+    def cache(self, hit):
+        self.record["cache"] = "hit" if hit else "miss"
+
+    def get(self, session, url, **kwargs):
+        # Waiting for a rate limiter token is self-imposed, so it is kept out of the network stages
+        limiter = getattr(session, "limiter", None)
+        if limiter is not None:
+            with self.stage("wait"):
+                limiter.acquire()
+            session = session.session
+
+        started = time.perf_counter()
+        response = session.get(url, **kwargs)
+        total = time.perf_counter() - started
+
+        # requests stamps `elapsed` when the headers arrive and reads the body afterwards
+        elapsed = getattr(response, "elapsed", None)
+        request = min(elapsed.total_seconds() if elapsed is not None else total, total)
+        # The stdlib transport times the name lookup inside its connect(); it is part of `elapsed`
+        dns_elapsed = getattr(response, "dns_elapsed", None)
+        dns = min(dns_elapsed.total_seconds(), request) if dns_elapsed else 0.0
+        if dns:
+            self.add("dns", dns)
+        self.add("request", request - dns)
+        self.add("transfer", total - request)
+        self.record["status"] = response.status_code
+        return response
+
+    def json(self, response):
+        with self.stage("parse"):
+            return response.json()
+
+
+def flush(path=METRICS_PATH):
+    # Append this process's records to the rolling log; metrics must never break a fetch
+    with _pending_lock:
+        records = list(_pending)
+        _pending.clear()
+    if not records:
+        return
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.lock", "w") as lock_file:
+            # Several scripts write the same log, so appends and trims take turns
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            with open(path, "a") as f:
+                f.write("".join(json.dumps(record) + "\n" for record in records))
+
+            with open(path, "r") as f:
+                lines = f.readlines()
+            if len(lines) > 2 * MAX_RECORDS:
+                tmp = f"{path}.tmp"
+                with open(tmp, "w") as f:
+                    f.writelines(lines[-MAX_RECORDS:])
+                os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def load_records(path=METRICS_PATH, since=0):
+    # Records newer than `since` (epoch seconds), oldest first; unreadable lines are skipped
+    records = []
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and record.get("ts", 0) >= since:
+                    records.append(record)
+    except OSError:
+        pass
+    return records
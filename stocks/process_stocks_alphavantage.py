@@ -4,24 +4,54 @@ import os
 import sys
 import time
 import json
+import zlib
 import argparse
 from datetime import datetime, timedelta
+import horizons
+import market_calendar
+import sparkline
+import metrics
 
 # Directory containing cached per-symbol JSON files
 CACHE_DIR = os.path.expanduser("~/.cache/mgconky/stocks_alphavantage/")
 
-def main():
-    # Parse command-line arguments (reader does not need api_key)
-    parser = argparse.ArgumentParser(description="Process cached Alpha Vantage stock data.")
-    parser.add_argument("--symbols", required=True, help="Comma-separated list of stock symbols")
-    parser.add_argument("--range_in_days", type=int, default=0, help="Number of days for historical comparison")
-    parser.add_argument("--price_dec_places", type=int, default=0, help="Decimal places for prices")
-    parser.add_argument("--percent_dec_places", type=int, default=1, help="Decimal places for percentages")
-    parser.add_argument("--stale_seconds", type=int, default=13 * 3600, help="Seconds before cached data is considered stale")
-    args = parser.parse_args()
+# Consolidated snapshot of all payloads written by get_stocks_alphavantage.py
+INDEX_PATH = os.path.join(CACHE_DIR, "index.json")
 
-    # Split ticker symbols by comma
-    symbols = args.symbols.strip().upper().split(",")
+
+def load_payloads(symbols):
+    # One read of the consolidated index; per-symbol files only if the fetcher has not written one yet
+    try:
+        with open(INDEX_PATH, "r") as f:
+            index = json.load(f)
+        return {symbol: index["symbols"].get(symbol) for symbol in symbols}
+    except Exception:
+        pass
+
+    payloads = {}
+    for symbol in symbols:
+        try:
+            with open(os.path.join(CACHE_DIR, f"{symbol}.json"), "r") as f:
+                payloads[symbol] = json.load(f)
+        except Exception:
+            payloads[symbol] = None
+    return payloads
+
+
+def sparkline_lines(args, fetched_data, indent, color_good, color_bad):
+    # Optional line under a quote: the intraday series as a --sparkline characters wide block graph
+    series = fetched_data.get("series")
+    if args.sparkline < 1 or not isinstance(series, list) or len(series) < 2:
+        return []
+    closes = [point[1] for point in series]
+    color = color_good if closes[-1] >= closes[0] else color_bad
+    return [f"{indent}{color}{sparkline.render_text(closes, args.sparkline)}"]
+
+
+def render(args, symbols, payloads):
+    # Returns the Conky block and the time until which it stays valid (next symbol turning stale)
+    now = time.time()
+    valid_until = float("inf")
 
     # Collect formatted output lines for Conky
     output = []
@@ -35,13 +65,14 @@ def main():
     line_tab1_offset = "${goto 25}"
     line_tab2_offset = "${goto 90}"
     line_tab3_offset = "${alignr}"
+    horizon_column_width = 7  # Characters per --horizons column (right-aligned in the monospace font)
 
     # Process each symbol
     for symbol in symbols:
-        cache_path = os.path.join(CACHE_DIR, f"{symbol}.json")
+        payload = payloads.get(symbol)
 
-        # Missing cache file -- display formatted placeholder
-        if not os.path.exists(cache_path):
+        # Missing cache entry -- display formatted placeholder
+        if payload is None:
             output.append(
                 f"{line_tab1_offset}{color_bad}{symbol}: "
                 f"{line_tab2_offset}{color_value}-- "
@@ -49,25 +80,13 @@ def main():
             )
             continue
 
-        # Determine cache age using file modification time
-        age_seconds = time.time() - os.stat(cache_path).st_mtime
-
-        # Symbol turns red (color_bad) if cached data is stale
-        symbol_color = color_bad if age_seconds > args.stale_seconds else color_label
-
-        # Load cached JSON payload
-        try:
-            with open(cache_path, "r") as f:
-                payload = json.load(f)
-
-            # Validate payload structure before use
-            if not isinstance(payload, dict) or "data" not in payload:
-                raise ValueError("Invalid cache payload")
-
-            fetched_data = payload["data"]
-
-        except Exception:
-            # Corrupt or unreadable cache file -- display formatted placeholder
+        # Validate payload structure before use
+        if (
+            not isinstance(payload, dict)
+            or "data" not in payload
+            or not isinstance(payload.get("timestamp"), (int, float))
+        ):
+            # Corrupt cache entry -- display formatted placeholder
             output.append(
                 f"{line_tab1_offset}{color_bad}{symbol}: "
                 f"{line_tab2_offset}{color_value}-- "
@@ -75,6 +94,15 @@ def main():
             )
             continue
 
+        fetched_data = payload["data"]
+
+        # Symbol turns red (color_bad) once cached data is stale; the rendered block expires at that moment.
+        # Data counts as stale --stale_seconds after the fetch (or the next open after it), never while the market is closed.
+        stale_at = market_calendar.stale_at(symbol, payload["timestamp"], args.stale_seconds, now)
+        symbol_color = color_bad if now > stale_at else color_label
+        if now <= stale_at:
+            valid_until = min(valid_until, stale_at)
+
         # ------------------------------
         # VALIDATION
         # ------------------------------
@@ -86,6 +114,30 @@ def main():
             current_price = fetched_data["current_price"]
             compare_price = fetched_data["compare_price"]
 
+            # One percent-change column per horizon, from the comparisons the fetcher stored
+            if args.horizons:
+                horizon_changes = horizons.changes(current_price, fetched_data.get("compare_prices") or {})
+                columns = []
+                for label in args.horizons:
+                    if horizon_changes.get(label) is None:
+                        columns.append(f"{color_value}{'--':>{horizon_column_width}}")
+                        continue
+                    price_difference, percent_change = horizon_changes[label]
+                    color_dynamic = (
+                        color_good if round(price_difference, args.price_dec_places) > 0
+                        else color_bad if round(price_difference, args.price_dec_places) < 0
+                        else color_value
+                    )
+                    percent_text = f"{round(percent_change, args.percent_dec_places):+.{args.percent_dec_places}f}%"
+                    columns.append(f"{color_dynamic}{percent_text:>{horizon_column_width}}")
+                output.append(
+                    f"{line_tab1_offset}{symbol_color}{symbol}: "
+                    f"{line_tab2_offset}{color_value}{round(current_price, args.price_dec_places):.{args.price_dec_places}f} "
+                    f"{line_tab3_offset}{''.join(columns)}"
+                )
+                output.extend(sparkline_lines(args, fetched_data, line_tab1_offset, color_good, color_bad))
+                continue
+
             # Comparison price may be missing if no trading day was found
             if not isinstance(compare_price, (int, float)):
                 symbol_color = color_bad
@@ -114,6 +166,7 @@ def main():
                 f"{line_tab3_offset}{color_dynamic}{round(price_difference, args.price_dec_places):+.{args.price_dec_places}f} "
                 f"({round(percent_change, args.percent_dec_places):+.{args.percent_dec_places}f}%)"
             )
+            output.extend(sparkline_lines(args, fetched_data, line_tab1_offset, color_good, color_bad))
         else:
             # Cached data missing required fields -- display formatted placeholder
             output.append(
@@ -124,6 +177,8 @@ def main():
 
     # Header label depends on intraday vs historical mode
     header_label = "Intraday" if args.range_in_days < 1 else f"{args.range_in_days} Day"
+    if args.horizons:
+        header_label = "".join(f"{label.upper():>{horizon_column_width}}" for label in args.horizons)
 
     # Formatted header line
     header_line = (
@@ -132,15 +187,71 @@ def main():
         f"{line_tab3_offset}{header_label}{color_label}"
     )
 
-    # Print final output for Conky to render
-    print(
+    # Final output for Conky to render
+    block = (
         header_line
         + "\n"
         + f"{line_tab1_offset}{color_header}${{voffset -5}}${{hr 1}}"
         + "\n"
         + "\n".join(output)
     )
+    return block, valid_until
+
+
+def main():
+    # Parse command-line arguments (reader does not need api_key)
+    parser = argparse.ArgumentParser(description="Process cached Alpha Vantage stock data.")
+    parser.add_argument("--symbols", required=True, help="Comma-separated list of stock symbols")
+    parser.add_argument("--range_in_days", type=int, default=0, help="Number of days for historical comparison")
+    parser.add_argument("--horizons", default=None, type=horizons.parse_horizons, help="Comma-separated comparison columns, same list as given to the fetcher (e.g. 1d,7d,30d,ytd)")
+    parser.add_argument("--price_dec_places", type=int, default=0, help="Decimal places for prices")
+    parser.add_argument("--percent_dec_places", type=int, default=1, help="Decimal places for percentages")
+    parser.add_argument("--sparkline", type=int, default=0, help="Characters wide intraday sparkline under each quote, e.g. 28 (default is 0, off; intraday mode only)")
+    parser.add_argument("--stale_seconds", type=int, default=13 * 3600, help="Seconds before cached data is considered stale")
+    args = parser.parse_args()
+
+    # Split ticker symbols by comma
+    symbols = args.symbols.strip().upper().split(",")
+
+    # Memoized output is keyed by the arguments and tied to one generation of the index file.
+    # os.replace() gives every new index a new inode, so (inode, mtime) identifies the generation.
+    # (crc32 rather than hashlib, which costs more to import than this whole cache-hit path)
+    memo_key = f"{zlib.crc32(repr(sorted(vars(args).items())).encode()):08x}"
+    memo_path = os.path.join(CACHE_DIR, f"rendered_{memo_key}.txt")
+    try:
+        index_stat = os.stat(INDEX_PATH)
+        generation = [index_stat.st_ino, index_stat.st_mtime_ns]
+    except OSError:
+        generation = None
+
+    with metrics.FetchTimer("alphavantage", "render") as timer:
+        if generation is not None:
+            try:
+                with timer.stage("render"), open(memo_path, "r") as f:
+                    memo = json.loads(f.readline())
+                    if memo["generation"] == generation and time.time() <= memo["valid_until"]:
+                        # Nothing changed since the last render -- print it as is
+                        timer.cache(True)
+                        print(f.read())
+                        return
+            except Exception:
+                # No memo yet or unreadable -- render from scratch
+                pass
+
+        timer.cache(False)
+        with timer.stage("render"):
+            block, valid_until = render(args, symbols, load_payloads(symbols))
+        print(block)
+
+        if generation is not None:
+            tmp = f"{memo_path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                f.write(json.dumps({"generation": generation, "valid_until": min(valid_until, 2 ** 53)}) + "\n")
+                f.write(block)
+            os.replace(tmp, memo_path)
+
 
 if __name__ == "__main__":
     main()
+    metrics.flush()
 
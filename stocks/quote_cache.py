@@ -0,0 +1,115 @@
+import os
+import json
+import time
+
+# Per-provider failure bookkeeping lives next to the other mgconky caches
+CACHE_DIR = os.path.expanduser("~/.cache/mgconky/")
+
+# Exponential backoff: 30 s after the first failure, doubling up to 30 minutes
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 30 * 60
+
+# Consecutive whole-provider failures before the circuit opens and the provider is left alone
+BREAKER_THRESHOLD = 3
+
+
+def backoff_seconds(failures):
+    return min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** max(0, failures - 1))
+
+
+class FetchHealth:
+    """Consecutive failures per provider and per symbol, with exponential backoff and a circuit breaker.
+
+    A failing symbol is skipped until its backoff has passed.  When a whole refresh fails
+    BREAKER_THRESHOLD times in a row the provider's circuit opens: no requests at all until
+    the (growing) backoff has passed, then a single refresh probes whether it is back.
+    """
+
+    def __init__(self, provider, path=None):
+        self.provider = provider
+        self.path = path or os.path.join(CACHE_DIR, f"fetch_health_{provider}.json")
+        self.state = {"provider": {"failures": 0, "retry_at": 0}, "symbols": {}}
+        try:
+            with open(self.path, "r") as f:
+                loaded = json.load(f)
+            if isinstance(loaded, dict) and isinstance(loaded.get("symbols"), dict):
+                self.state = loaded
+        except Exception:
+            # Missing or unreadable -> everything is considered healthy
+            pass
+
+    def provider_available(self, now=None):
+        return (now or time.time()) >= self.state["provider"].get("retry_at", 0)
+
+    def symbol_available(self, symbol, now=None):
+        return (now or time.time()) >= self.state["symbols"].get(symbol, {}).get("retry_at", 0)
+
+    def record_symbol(self, symbol, ok, now=None):
+        if ok:
+            self.state["symbols"].pop(symbol, None)
+            return
+        entry = self.state["symbols"].setdefault(symbol, {"failures": 0})
+        entry["failures"] += 1
+        entry["retry_at"] = (now or time.time()) + backoff_seconds(entry["failures"])
+
+    def record_provider(self, ok, now=None):
+        entry = self.state["provider"]
+        if ok:
+            entry["failures"] = 0
+            entry["retry_at"] = 0
+            return
+        entry["failures"] = entry.get("failures", 0) + 1
+        if entry["failures"] >= BREAKER_THRESHOLD:
+            entry["retry_at"] = (now or time.time()) + backoff_seconds(entry["failures"] - BREAKER_THRESHOLD + 1)
+
+    def record_refresh(self, outcomes, now=None):
+        # outcomes: {symbol: ok}.  When every symbol failed the provider is at fault, not the symbols --
+        # but only if there were at least two; a lone failure (common under Alpha Vantage's daily budget)
+        # may just be a bad symbol, which should back off on its own instead of tripping the breaker for all.
+        if not outcomes:
+            return
+        if len(outcomes) >= 2 and not any(outcomes.values()):
+            self.record_provider(False, now)
+            return
+        if any(outcomes.values()):
+            self.record_provider(True, now)
+        for symbol, ok in outcomes.items():
+            self.record_symbol(symbol, ok, now)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+
+class LastGoodCache:
+    """Most recent successful result per symbol, one JSON file each, so it can be served while a refresh runs."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def path(self, symbol):
+        return os.path.join(self.cache_dir, f"{symbol}.json")
+
+    def load(self, symbol):
+        # {"timestamp": ..., ...} or None if missing/unreadable
+        try:
+            with open(self.path(symbol), "r") as f:
+                entry = json.load(f)
+            if isinstance(entry, dict) and isinstance(entry.get("timestamp"), (int, float)):
+                return entry
+        except Exception:
+            pass
+        return None
+
+    def store(self, symbol, entry):
+        # Atomic write so a concurrent reader never sees half an entry
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = dict(entry, timestamp=time.time())
+        tmp = f"{self.path(symbol)}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, self.path(symbol))
+        return entry
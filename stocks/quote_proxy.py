@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import hmac
+import argparse
+import ipaddress
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qsl
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from rate_limiter import RateLimiter, REQUESTS_PER_MINUTE
+import transport
+
+# Upstream APIs (overridable like in the fetchers, e.g. to put the proxy in front of bench/mock_server.py)
+FINNHUB_API_URL = os.environ.get("MGCONKY_FINNHUB_URL", "https://finnhub.io/api/v1")
+ALPHAVANTAGE_API_URL = os.environ.get("MGCONKY_ALPHAVANTAGE_URL", "https://www.alphavantage.co/query")
+
+# Query parameter carrying each provider's API key; left out of the cache key so every desktop shares one entry
+KEY_PARAMS = {"finnhub": "token", "alphavantage": "apikey"}
+
+# FinnHub candle windows are relative to "now"; they are widened to TTL boundaries (from rounded down,
+# to rounded up) so clients ask the same question without losing the newest candles
+TIME_PARAMS = ("from", "to")
+
+# Entries kept at most (expired ones are dropped first)
+MAX_ENTRIES = 1000
+
+# Upstream request timeout; waiters give up a little later than that
+UPSTREAM_TIMEOUT = 10
+
+
+def log_error(message):
+    """Print timestamped error message to stderr and flush immediately."""
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{ts}] {message}", file=sys.stderr, flush=True)
+
+
+def error_result(status, message):
+    # (status, body, stored_at) for an answer the proxy makes up itself
+    return status, json.dumps({"error": message}).encode(), time.time()
+
+
+class Flight:
+    """One upstream request in progress; identical requests arriving meanwhile wait for its result."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class QuoteProxyHandler(BaseHTTPRequestHandler):
+    """Serves FinnHub under /finnhub/... and Alpha Vantage under /alphavantage/query, like bench/mock_server.py."""
+
+    # Keep-alive, so a client's pooled session reuses its connection
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if self.server.token:
+            # Clients include the shared token as the first path segment: --proxy http://host:8765/<token>
+            prefix = f"/{self.server.token}/"
+            if not hmac.compare_digest(url.path[:len(prefix)].encode(), prefix.encode()):
+                self.send_body(403, json.dumps({"error": "missing or wrong proxy token"}).encode(), "MISS", 0)
+                return
+            url = url._replace(path=url.path[len(prefix) - 1:])
+        params = parse_qsl(url.query, keep_blank_values=True)
+        if url.path.startswith("/finnhub/"):
+            provider, upstream = "finnhub", self.server.finnhub_url + url.path[len("/finnhub"):]
+        elif url.path == "/alphavantage/query":
+            provider, upstream = "alphavantage", self.server.alphavantage_url
+        else:
+            self.send_body(404, json.dumps({"error": "not found"}).encode(), "MISS", 0)
+            return
+
+        (status, body, stored_at), source = self.server.lookup(provider, upstream, params)
+        self.send_body(status, body, source, time.time() - stored_at)
+
+    def send_body(self, status, body, source, age):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Cache", source)
+        self.send_header("Age", str(int(max(0, age))))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class QuoteProxy(ThreadingHTTPServer):
+    """TTL cache plus single-flight in front of FinnHub and Alpha Vantage, shared by every client."""
+
+    daemon_threads = True
+
+    def __init__(self, address, ttls, finnhub_url=FINNHUB_API_URL, alphavantage_url=ALPHAVANTAGE_API_URL,
+                 keys=None, requests_per_minute=REQUESTS_PER_MINUTE, token=None):
+        super().__init__(address, QuoteProxyHandler)
+        self.ttls = ttls
+        self.finnhub_url = finnhub_url.rstrip("/")
+        self.alphavantage_url = alphavantage_url
+        self.keys = keys or {}
+        self.token = token
+        self.limiter = RateLimiter(requests_per_minute)
+        self.session = transport.Session()
+        self.lock = threading.Lock()
+        self.cache = {}    # key -> (expires, (status, body, stored_at))
+        self.flights = {}  # key -> Flight
+        self.upstream_requests = 0
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def normalize(self, provider, params):
+        # (cache key params, upstream params): the key without the API key, time windows widened to the TTL
+        ttl = max(1, self.ttls[provider])
+        key_param = KEY_PARAMS[provider]
+        normalized = []
+        api_key = self.keys.get(provider)
+        for name, value in params:
+            if name == key_param:
+                api_key = api_key or value
+                continue
+            if provider == "finnhub" and name in TIME_PARAMS and value.isdigit():
+                # -(-x // ttl) rounds up
+                value = str(int(value) // ttl * ttl if name == "from" else -(-int(value) // ttl) * ttl)
+            normalized.append((name, value))
+        normalized.sort()
+        upstream = dict(normalized)
+        if api_key:
+            upstream[key_param] = api_key
+        return tuple(normalized), upstream
+
+    def lookup(self, provider, upstream_url, params):
+        # ((status, body, stored_at), "HIT" | "MISS" | "SHARED" | "STALE")
+        key_params, upstream_params = self.normalize(provider, params)
+        key = (upstream_url, key_params)
+        now = time.time()
+
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1], "HIT"
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+
+        if not leader:
+            # Same request already on its way upstream -- share its answer
+            # (the leader's own answer, errors included)
+            if flight.done.wait(UPSTREAM_TIMEOUT + 5):
+                return flight.result, "SHARED"
+            return error_result(504, "timed out waiting for the upstream request"), "SHARED"
+
+        result, source = error_result(502, "upstream request aborted"), "MISS"
+        try:
+            result = self.fetch(provider, upstream_url, upstream_params)
+        finally:
+            with self.lock:
+                if self.cacheable(result):
+                    self.cache[key] = (result[2] + self.ttls[provider], result)
+                    self.prune(now)
+                elif entry is not None:
+                    # Keep serving the last good answer while upstream is failing
+                    result, source = entry[1], "STALE"
+                del self.flights[key]
+            flight.result = result
+            flight.done.set()
+        return result, source
+
+    def fetch(self, provider, upstream_url, upstream_params):
+        if provider == "finnhub":
+            self.limiter.acquire()
+        try:
+            response = self.session.get(upstream_url, params=upstream_params, timeout=UPSTREAM_TIMEOUT)
+        except transport.request_errors() as e:
+            log_error(f"Upstream {provider} request failed - {e}")
+            return error_result(502, f"upstream request failed - {e}")
+        with self.lock:
+            self.upstream_requests += 1
+        if response.status_code != 200:
+            log_error(f"Upstream {provider} answered HTTP {response.status_code}")
+        return response.status_code, response.content, time.time()
+
+    @staticmethod
+    def cacheable(result):
+        # Only real data: not errors, and not Alpha Vantage's rate-limit notes (sent as HTTP 200)
+        status, body, _ = result
+        if status != 200:
+            return False
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return False
+        return not (isinstance(data, dict) and ("Information" in data or "Note" in data or "error" in data))
+
+    def prune(self, now):
+        # Called with the lock held
+        if len(self.cache) <= MAX_ENTRIES:
+            return
+        for key in [key for key, (expires, _) in self.cache.items() if expires <= now]:
+            del self.cache[key]
+        while len(self.cache) > MAX_ENTRIES:
+            del self.cache[min(self.cache, key=lambda key: self.cache[key][0])]
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        # A host name -- may well resolve to a public address
+        return False
+
+
+def main():
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Caching proxy that lets many mgconky desktops share one FinnHub / Alpha Vantage fetch.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on; 0.0.0.0 serves the whole network and requires --token (default is 127.0.0.1, this machine only)")
+    parser.add_argument("--port", default=8765, type=int, help="Port to listen on (default is 8765)")
+    parser.add_argument("--finnhub_ttl", default=60, type=int, help="Seconds a FinnHub answer is served from cache (default is 60)")
+    parser.add_argument("--alphavantage_ttl", default=900, type=int, help="Seconds an Alpha Vantage answer is served from cache (default is 900)")
+    parser.add_argument("--finnhub_key", default=None, help="FinnHub key used for every upstream request (default is the requesting client's)")
+    parser.add_argument("--alphavantage_key", default=None, help="Alpha Vantage key used for every upstream request (default is the requesting client's)")
+    parser.add_argument("--finnhub_url", default=FINNHUB_API_URL, help=f"Upstream FinnHub API (default is {FINNHUB_API_URL})")
+    parser.add_argument("--alphavantage_url", default=ALPHAVANTAGE_API_URL, help=f"Upstream Alpha Vantage API (default is {ALPHAVANTAGE_API_URL})")
+    parser.add_argument("--token", default=None, help="Shared secret clients put in front of the API path, e.g. --proxy http://quotes.lan:8765/<token> (default is none)")
+    parser.add_argument("--requests_per_minute", default=REQUESTS_PER_MINUTE, type=int, help=f"FinnHub upstream budget per minute (default is {REQUESTS_PER_MINUTE})")
+    args = parser.parse_args()
+
+    # The proxy spends its operator's API quota (and keys), so only this machine may use it without a token
+    if not args.token and not is_loopback(args.host):
+        parser.error(f"--token is required to listen on {args.host} (anyone who can reach it could spend your API quota)")
+
+    proxy = QuoteProxy(
+        (args.host, args.port),
+        {"finnhub": args.finnhub_ttl, "alphavantage": args.alphavantage_ttl},
+        args.finnhub_url,
+        args.alphavantage_url,
+        {"finnhub": args.finnhub_key, "alphavantage": args.alphavantage_key},
+        args.requests_per_minute,
+        args.token,
+    )
+    client_url = f"http://<this host>:{proxy.server_address[1]}" + (f"/{args.token}" if args.token else "")
+    print(f"Clients: add --proxy {client_url} to get_stocks_finnhub.py / get_stocks_alphavantage.py", flush=True)
+    proxy.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import time
+import threading
+
+# FinnHub free tier budget
+REQUESTS_PER_MINUTE = 60
+
+
+class RateLimiter:
+    """Thread-safe token bucket: holds up to `capacity` tokens, refilled at `rate` tokens per second."""
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE):
+        self.capacity = max(1, requests_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # Block until a token is available, then spend it
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+import json
+import time
+import base64
+import struct
+import hashlib
+import argparse
+import threading
+import socketserver
+
+# RFC 6455 handshake constant
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Playback starts once the client has subscribed: at most this long for the first subscription,
+# then until no further one arrives for SUBSCRIBE_SETTLE_SECONDS (clients subscribe in a burst, one per symbol)
+SUBSCRIBE_TIMEOUT_SECONDS = 10
+SUBSCRIBE_SETTLE_SECONDS = 0.25
+
+
+def load_feed(path):
+    # Recorded feed: one {"t": seconds_since_start, "message": "<raw json>"} per line (see --record)
+    feed = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)
+                message = entry["message"]
+                feed.append((float(entry.get("t", 0)), message if isinstance(message, str) else json.dumps(message)))
+    return feed
+
+
+def send_frame(sock, payload, opcode=0x1):
+    # Server-to-client frames are never masked
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 65536:
+        header += bytes([126]) + struct.pack("!H", length)
+    else:
+        header += bytes([127]) + struct.pack("!Q", length)
+    sock.sendall(header + payload)
+
+
+def recv_exact(sock, count):
+    data = b""
+    while len(data) < count:
+        chunk = sock.recv(count - len(data))
+        if not chunk:
+            raise ConnectionError("client went away")
+        data += chunk
+    return data
+
+
+def recv_frame(sock):
+    # Client-to-server frames are always masked
+    first, second = recv_exact(sock, 2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", recv_exact(sock, 2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", recv_exact(sock, 8))[0]
+    mask = recv_exact(sock, 4) if second & 0x80 else b"\0\0\0\0"
+    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(recv_exact(sock, length)))
+    return opcode, payload
+
+
+class ReplayHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # --- Handshake ---
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return
+            request += chunk
+        headers = {}
+        for line in request.decode(errors="replace").split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        self.request.sendall(
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+
+        # --- Read subscriptions (and answer pings) in the background ---
+        subscribed = set()
+        subscribing = threading.Event()
+        closed = threading.Event()
+
+        def reader():
+            try:
+                while not closed.is_set():
+                    opcode, payload = recv_frame(self.request)
+                    if opcode == 0x8:
+                        break
+                    if opcode == 0x9:
+                        send_frame(self.request, payload, opcode=0xA)
+                    elif opcode == 0x1:
+                        message = json.loads(payload)
+                        if message.get("type") == "subscribe":
+                            subscribed.add(message.get("symbol"))
+                            subscribing.set()
+                        elif message.get("type") == "unsubscribe":
+                            subscribed.discard(message.get("symbol"))
+            except (OSError, ValueError, ConnectionError):
+                pass
+            closed.set()
+
+        threading.Thread(target=reader, daemon=True).start()
+
+        # --- Wait for the subscriptions, so replays do not depend on how fast the client sends them ---
+        if subscribing.wait(SUBSCRIBE_TIMEOUT_SECONDS):
+            subscribing.clear()
+            while subscribing.wait(SUBSCRIBE_SETTLE_SECONDS):
+                subscribing.clear()
+
+        # --- Replay with the recorded pacing (scaled by --speed) ---
+        try:
+            while not closed.is_set():
+                started = time.monotonic()
+                for offset, message in self.server.feed:
+                    delay = offset / self.server.speed - (time.monotonic() - started)
+                    if delay > 0 and closed.wait(delay):
+                        return
+                    # Only forward trades for symbols this client subscribed to
+                    data = json.loads(message)
+                    if data.get("type") == "trade":
+                        trades = [t for t in data.get("data") or [] if t.get("s") in subscribed]
+                        if not trades:
+                            continue
+                        message = json.dumps(dict(data, data=trades))
+                    send_frame(self.request, message.encode())
+                if not self.server.loop:
+                    closed.wait()
+        except OSError:
+            closed.set()
+
+
+class ReplayServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, feed, speed=1.0, loop=False):
+        super().__init__(address, ReplayHandler)
+        self.feed = feed
+        self.speed = speed
+        self.loop = loop
+
+
+def main():
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Replay a recorded FinnHub trade feed over a local WebSocket.")
+    parser.add_argument("--feed", required=True, help="JSON-lines file written by get_stocks_finnhub.py --record")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default is 127.0.0.1)")
+    parser.add_argument("--port", default=8766, type=int, help="Port to listen on (default is 8766; quote_proxy.py uses 8765)")
+    parser.add_argument("--speed", default=1.0, type=float, help="Playback speed multiplier (default is 1.0)")
+    parser.add_argument("--loop", action="store_true", help="Start over when the feed ends")
+    args = parser.parse_args()
+
+    server = ReplayServer((args.host, args.port), load_feed(args.feed), args.speed, args.loop)
+    print(f"Replaying {args.feed} on ws://{args.host}:{server.server_address[1]}", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
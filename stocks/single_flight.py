@@ -0,0 +1,108 @@
+import os
+import time
+import fcntl
+
+# How often a caller waiting behind another run checks whether it has finished
+POLL_SECONDS = 0.2
+
+
+class Flight:
+    """Cross-process single-flight for one refresh, held through a lock file.
+
+    Only one process at a time runs the refresh.  A process that finds it taken waits for
+    the owner to finish, then re-checks its cache and so reuses what the owner published
+    instead of fetching the same data again (see `shared_since`).  The lock file records the
+    owner's PID and lease expiry: an owner that died or overran its lease stops blocking
+    others, because its lock file is retired and a fresh one taken.
+
+        with Flight(path, lease_seconds=120) as flight:
+            if flight.acquired:
+                ...refresh whatever is still due...
+    """
+
+    def __init__(self, path, lease_seconds, wait_seconds=None):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        # How long to wait for the current owner (default: up to one lease); 0 only tries once
+        self.wait_seconds = lease_seconds if wait_seconds is None else wait_seconds
+        self.acquired = False
+        # Time this caller started waiting behind another run, None if it got the lock straight away.
+        # Whatever was published since then is that run's result and does not need fetching again.
+        self.shared_since = None
+        self.fd = None
+
+    def __enter__(self):
+        self.acquired = self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def acquire(self):
+        started = time.time()
+        deadline = started + self.wait_seconds
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if self.shared_since is None:
+                    self.shared_since = started
+                if self.owner_gone(fd):
+                    # Dead owner (lock inherited by a leftover child) or one hung past its lease -- retire its file
+                    self.retire(fd)
+                os.close(fd)
+                if time.time() >= deadline:
+                    return False
+                time.sleep(POLL_SECONDS)
+                continue
+
+            if not self.is_current(fd):
+                # Retired while we were getting it; try the new lock file
+                os.close(fd)
+                continue
+            os.ftruncate(fd, 0)
+            os.write(fd, f"{os.getpid()} {int(time.time() + self.lease_seconds)}\n".encode())
+            self.fd = fd
+            return True
+
+    def release(self):
+        if self.fd is not None:
+            # Emptied, so nobody takes a finished run for a live owner; closing drops the lock
+            os.ftruncate(self.fd, 0)
+            os.close(self.fd)
+            self.fd = None
+
+    def is_current(self, fd):
+        # Whether fd is still the file at self.path (not retired and replaced meanwhile)
+        try:
+            return os.stat(self.path).st_ino == os.fstat(fd).st_ino
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def owner_gone(fd):
+        # "PID lease_expiry" as written by the owner; an empty or partial file means it is just starting
+        try:
+            pid, expires = (int(field) for field in os.pread(fd, 64, 0).split())
+        except ValueError:
+            return False
+        if time.time() > expires:
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            # Someone else's process, but alive
+            pass
+        return False
+
+    def retire(self, fd):
+        # Only unlink the file the expired owner holds, never a successor's
+        if self.is_current(fd):
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
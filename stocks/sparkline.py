@@ -0,0 +1,54 @@
+# Eight block heights, lowest to highest, one character per column
+BLOCKS = "▁▂▃▄▅▆▇█"
+
+
+def lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of [(x, y), ...] (sorted by x) to `threshold` points.
+
+    Keeps the first and last point and, from each bucket in between, the point forming the
+    largest triangle with the previously kept point and the average of the next bucket, so
+    spikes and turning points survive where plain averaging or striding would flatten them.
+    """
+    if threshold >= len(points):
+        return list(points)
+    if threshold < 3:
+        return [points[0], points[-1]][:max(threshold, 0)]
+
+    sampled = [points[0]]
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    kept = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        # Average of the next bucket (just the last point for the final bucket)
+        next_start, next_end = end, min(int((bucket + 2) * bucket_size) + 1, len(points))
+        next_points = points[next_start:next_end] or [points[-1]]
+        avg_x = sum(x for x, _ in next_points) / len(next_points)
+        avg_y = sum(y for _, y in next_points) / len(next_points)
+
+        kept_x, kept_y = points[kept]
+        best, best_area = start, -1.0
+        for i in range(start, end):
+            x, y = points[i]
+            area = abs((kept_x - avg_x) * (y - kept_y) - (kept_x - x) * (avg_y - kept_y))
+            if area > best_area:
+                best, best_area = i, area
+        sampled.append(points[best])
+        kept = best
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def render_text(values, width):
+    # Unicode block sparkline of at most `width` characters (values already in time order)
+    if not values:
+        return ""
+    if len(values) > width:
+        values = [y for _, y in lttb(list(enumerate(values)), width)]
+    low, high = min(values), max(values)
+    if high == low:
+        return BLOCKS[len(BLOCKS) // 2] * len(values)
+    scale = (len(BLOCKS) - 1) / (high - low)
+    return "".join(BLOCKS[round((value - low) * scale)] for value in values)
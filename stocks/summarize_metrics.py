@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+import os
+import math
+import time
+import argparse
+import metrics
+
+# Stages that make up the latency of one network fetch (limiter wait is self-imposed and left out)
+FETCH_STAGES = ("dns", "request", "transfer", "parse")
+
+# Short labels for the --stages line
+STAGE_LABELS = {"wait": "wait", "dns": "dns", "request": "req", "transfer": "xfer", "parse": "parse", "render": "render"}
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile of a non-empty list
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(records):
+    # provider -> latency percentiles, per-stage medians, error count and cache hit ratio
+    providers = {}
+    for record in records:
+        summary = providers.setdefault(record.get("provider") or "unknown", {"latencies": [], "stages": {}, "errors": 0, "hits": 0, "lookups": 0})
+        stages = record.get("stages") or {}
+        for stage, seconds in stages.items():
+            summary["stages"].setdefault(stage, []).append(seconds)
+        if "request" in stages:
+            summary["latencies"].append(sum(stages.get(stage, 0) for stage in FETCH_STAGES))
+            if record.get("status") != 200:
+                summary["errors"] += 1
+        elif record.get("fetcher", "").startswith("fetch_") and record.get("cache") != "hit":
+            # A fetch that never got a response (connection error, timeout)
+            summary["errors"] += 1
+        if record.get("cache") is not None:
+            summary["lookups"] += 1
+            summary["hits"] += record["cache"] == "hit"
+    return providers
+
+
+def milliseconds(seconds):
+    return f"{seconds * 1000:.0f}ms"
+
+
+def render_conky(providers, show_stages):
+    # One line per provider, laid out like the quote blocks
+    line_tab1_offset = "${goto 25}"
+    line_tab2_offset = "${goto 90}"
+    line_tab3_offset = "${alignr}"
+    color_label = "${color3}"
+    color_value = "${color3}"
+    color_bad = "${color7}"
+
+    output = []
+    for provider, summary in sorted(providers.items()):
+        if summary["latencies"]:
+            latency = f"{milliseconds(percentile(summary['latencies'], 0.5))} / {milliseconds(percentile(summary['latencies'], 0.95))}"
+        else:
+            latency = "--"
+        hit_ratio = f" {100 * summary['hits'] / summary['lookups']:.0f}% hit" if summary["lookups"] else ""
+        error_color = color_bad if summary["errors"] else color_value
+        output.append(
+            f"{line_tab1_offset}{color_label}{provider}: {line_tab2_offset}{color_value}{latency}"
+            f"{line_tab3_offset}{error_color}{summary['errors']} err{color_value}{hit_ratio}"
+        )
+        if show_stages:
+            # Pipeline order, so the line reads left to right like a fetch does
+            order = list(STAGE_LABELS)
+            stages = " ".join(
+                f"{STAGE_LABELS.get(stage, stage)} {milliseconds(percentile(summary['stages'][stage], 0.5))}"
+                for stage in sorted(summary["stages"], key=lambda stage: order.index(stage) if stage in order else len(order))
+            )
+            output.append(f"{line_tab1_offset}{color_value}{stages}")
+    return "\n".join(output)
+
+
+def prometheus_labels(**labels):
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+
+def render_prometheus(records, window):
+    # Text exposition format (e.g. for node_exporter's textfile collector); values cover the last `window` seconds
+    stage_values = {}
+    statuses = {}
+    cache = {}
+    for record in records:
+        provider = record.get("provider") or "unknown"
+        fetcher = record.get("fetcher") or "unknown"
+        for stage, seconds in (record.get("stages") or {}).items():
+            stage_values.setdefault((provider, fetcher, stage), []).append(seconds)
+        if "request" in (record.get("stages") or {}):
+            key = (provider, fetcher, str(record.get("status")))
+            statuses[key] = statuses.get(key, 0) + 1
+        if record.get("cache") is not None:
+            key = (provider, fetcher, record["cache"])
+            cache[key] = cache.get(key, 0) + 1
+
+    lines = [
+        f"# HELP mgconky_fetch_stage_seconds Per-stage fetch timings over the last {window} seconds.",
+        "# TYPE mgconky_fetch_stage_seconds summary",
+    ]
+    for (provider, fetcher, stage), values in sorted(stage_values.items()):
+        for quantile in (0.5, 0.95):
+            labels = prometheus_labels(provider=provider, fetcher=fetcher, stage=stage, quantile=quantile)
+            lines.append(f"mgconky_fetch_stage_seconds{labels} {percentile(values, quantile):.6f}")
+        labels = prometheus_labels(provider=provider, fetcher=fetcher, stage=stage)
+        lines.append(f"mgconky_fetch_stage_seconds_sum{labels} {sum(values):.6f}")
+        lines.append(f"mgconky_fetch_stage_seconds_count{labels} {len(values)}")
+
+    lines += [
+        f"# HELP mgconky_fetch_responses HTTP responses by status over the last {window} seconds.",
+        "# TYPE mgconky_fetch_responses gauge",
+    ]
+    for (provider, fetcher, status), count in sorted(statuses.items()):
+        lines.append(f"mgconky_fetch_responses{prometheus_labels(provider=provider, fetcher=fetcher, status=status)} {count}")
+
+    lines += [
+        f"# HELP mgconky_fetch_cache_lookups Cache hits and misses over the last {window} seconds.",
+        "# TYPE mgconky_fetch_cache_lookups gauge",
+    ]
+    for (provider, fetcher, result), count in sorted(cache.items()):
+        lines.append(f"mgconky_fetch_cache_lookups{prometheus_labels(provider=provider, fetcher=fetcher, result=result)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Summarize the fetch timings recorded by the stocks scripts.")
+    parser.add_argument("--window", default=900, type=int, help="Only use records from the last N seconds (default is 900)")
+    parser.add_argument("--provider", default=None, help="Only show this provider (finnhub or alphavantage)")
+    parser.add_argument("--stages", action="store_true", help="Add a line with the median time of every stage")
+    parser.add_argument("--prometheus", default=None, help="Also write the metrics in Prometheus text format to this file")
+    args = parser.parse_args()
+
+    records = metrics.load_records(since=time.time() - args.window)
+    if args.provider:
+        records = [record for record in records if record.get("provider") == args.provider]
+
+    if args.prometheus:
+        tmp = f"{args.prometheus}.tmp"
+        with open(tmp, "w") as f:
+            f.write(render_prometheus(records, args.window))
+        os.replace(tmp, args.prometheus)
+
+    print(render_conky(summarize(records), args.stages))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import sys
+import json
+import time
+import threading
+from datetime import timedelta
+
+# HTTP backends the stocks scripts can fetch with: requests (default) or the standard library,
+# which starts noticeably faster because nothing outside the stdlib has to be imported
+TRANSPORTS = ("requests", "stdlib")
+DEFAULT_TRANSPORT = "requests"
+
+# Idle keep-alive connections kept per host by the stdlib session
+MAX_IDLE_PER_HOST = 4
+
+# Shared by fetch functions that are called without a session
+_default_session = None
+
+
+class TransportError(OSError):
+    """Network or protocol failure in the stdlib session (the counterpart of requests.RequestException)."""
+
+
+class Response:
+    """The parts of a requests.Response the scripts use: status_code, headers, content, text, json() and elapsed.
+
+    dns_elapsed is extra: time spent resolving the host for this request's connection
+    (zero when a pooled connection was reused).
+    """
+
+    def __init__(self, url, status_code, headers, content, elapsed, dns_elapsed=timedelta(0)):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.elapsed = elapsed
+        self.dns_elapsed = dns_elapsed
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class Session:
+    """Minimal keep-alive HTTP(S) client on http.client, safe to share between threads.
+
+    Only GET is supported, which is all the fetchers need.  Proxy settings from the
+    environment are not applied; use the requests transport behind a proxy.
+    """
+
+    def __init__(self):
+        self.idle = {}
+        self.lock = threading.Lock()
+        self.ssl_context = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        with self.lock:
+            connections = [conn for pool in self.idle.values() for conn in pool]
+            self.idle.clear()
+        for conn in connections:
+            conn.close()
+
+    def connect(self, scheme, host, port, timeout):
+        import http.client
+
+        if scheme == "https":
+            if self.ssl_context is None:
+                import ssl
+                self.ssl_context = ssl.create_default_context()
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout, context=self.ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        # Resolve the host inside the connection's own connect() so the lookup can be timed
+        conn.dns_seconds = 0.0
+        conn._create_connection = lambda address, *args: resolve_and_connect(conn, address, *args)
+        return conn
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        import http.client
+        from urllib.parse import urlsplit, urlencode
+
+        if params:
+            url = f"{url}{'&' if '?' in url else '?'}{urlencode(params)}"
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise TransportError(f"Unsupported URL: {url}")
+        key = (parts.scheme, parts.hostname, parts.port)
+        target = parts.path or "/"
+        if parts.query:
+            target = f"{target}?{parts.query}"
+        request_headers = {"Accept-Encoding": "gzip", "Connection": "keep-alive"}
+        request_headers.update(headers or {})
+
+        # A pooled connection may have been closed by the server meanwhile; that is retried once on a new one
+        for attempt in range(2):
+            with self.lock:
+                pool = self.idle.get(key)
+                conn = pool.pop() if pool else None
+            reused = conn is not None
+            if conn is None:
+                conn = self.connect(parts.scheme, parts.hostname, parts.port, timeout)
+            elif timeout is not None:
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+
+            started = time.perf_counter()
+            try:
+                conn.request("GET", target, headers=request_headers)
+                raw = conn.getresponse()
+                # Headers are in: same point at which requests stamps `elapsed`
+                elapsed = timedelta(seconds=time.perf_counter() - started)
+                dns_elapsed = timedelta(seconds=conn.dns_seconds)
+                conn.dns_seconds = 0.0
+                content = raw.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise TransportError(f"Connection to {parts.hostname} failed - {e}") from e
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise TransportError(f"Request to {parts.hostname} failed - {e}") from e
+            break
+
+        if raw.will_close:
+            conn.close()
+        else:
+            with self.lock:
+                pool = self.idle.setdefault(key, [])
+                if len(pool) < MAX_IDLE_PER_HOST:
+                    pool.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+        if raw.getheader("Content-Encoding", "").lower() == "gzip":
+            import gzip
+            try:
+                content = gzip.decompress(content)
+            except (OSError, EOFError) as e:
+                raise TransportError(f"Invalid gzip body from {parts.hostname} - {e}") from e
+
+        return Response(url, raw.status, raw.headers, content, elapsed, dns_elapsed)
+
+
+def resolve_and_connect(conn, address, timeout=None, source_address=None):
+    # socket.create_connection with the name lookup timed separately (recorded on conn.dns_seconds)
+    import socket
+
+    host, port = address
+    started = time.perf_counter()
+    try:
+        addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    finally:
+        conn.dns_seconds = time.perf_counter() - started
+    error = None
+    for family, socktype, proto, canonname, sockaddr in addresses:
+        try:
+            return socket.create_connection(sockaddr[:2], timeout, source_address)
+        except OSError as e:
+            error = e
+    raise error
+
+
+def open_session(name=DEFAULT_TRANSPORT):
+    # A pooled session for the chosen transport; requests is only imported when it is asked for
+    if name == "stdlib":
+        return Session()
+    import requests
+    return requests.Session()
+
+
+def default_session():
+    global _default_session
+    if _default_session is None:
+        _default_session = open_session()
+    return _default_session
+
+
+def request_errors():
+    # Exceptions a failed fetch can raise with whichever transport is loaded (for use in `except`)
+    errors = (TransportError,)
+    if "requests" in sys.modules:
+        errors += (sys.modules["requests"].RequestException,)
+    return errors
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+# Same layout as render_pngs.sh: SVG/<id>.svg in, renders/<color>__<size>/<id>.png out
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SVG_DIR = os.path.join(SCRIPT_DIR, "SVG")
+RENDER_DIR = os.path.join(SCRIPT_DIR, "renders")
+
+DEFAULT_COLOR = "#000"
+DEFAULT_SIZE = 32
+
+# Written into every icon set: {"icons": {"<id>": "<file>.png"}, "default": "<file>.png"}
+MANIFEST_NAME = "manifest.json"
+
+# Content hash of every output, so unchanged icons are not rendered again
+RENDER_CACHE_NAME = ".render_cache.json"
+
+# Shown for weather ids that have no icon of their own (same icon the old scripts showed for a "null" id)
+FALLBACK_ICON_ID = "null"
+
+
+def recolor(svg_text, color):
+    # Same edit render_pngs.sh makes with sed, but on a copy in memory -- the sources are never touched
+    return svg_text.replace("<path", f'<path fill="{color}"')
+
+
+def pick_renderer(name):
+    # cairosvg renders in-process; Inkscape is the fallback (and what render_pngs.sh used)
+    if name in ("auto", "cairosvg"):
+        try:
+            import cairosvg  # noqa: F401
+            return "cairosvg"
+        except (ImportError, OSError):
+            # Not installed, or installed without the cairo library
+            if name == "cairosvg":
+                raise
+    if shutil.which("inkscape"):
+        return "inkscape"
+    return None
+
+
+def render_png(renderer, svg_text, size):
+    # Runs in a worker process; returns the PNG bytes
+    if renderer == "cairosvg":
+        import cairosvg
+        return cairosvg.svg2png(bytestring=svg_text.encode(), output_width=size, output_height=size)
+
+    with tempfile.TemporaryDirectory(prefix="mgconky-icon-") as tmp:
+        svg_path = os.path.join(tmp, "icon.svg")
+        png_path = os.path.join(tmp, "icon.png")
+        with open(svg_path, "w") as f:
+            f.write(svg_text)
+        # Inkscape 1.x flags first, then the 0.92 ones render_pngs.sh used
+        for export in (["--export-filename", png_path], ["-e", png_path]):
+            subprocess.run(
+                ["inkscape", svg_path, *export, f"--export-width={size}", f"--export-height={size}"],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            if os.path.exists(png_path):
+                with open(png_path, "rb") as f:
+                    return f.read()
+    raise RuntimeError("inkscape produced no output")
+
+
+def load_json(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def write_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def write_manifest(icon_dir):
+    # icon id -> file for every PNG in an icon set (also usable on the prebuilt lime32 / lime64 sets)
+    icons = {
+        name[:-4]: name
+        for name in sorted(os.listdir(icon_dir))
+        if name.endswith(".png")
+    }
+    manifest = {"icons": icons, "default": icons.get(FALLBACK_ICON_ID)}
+    write_atomic(os.path.join(icon_dir, MANIFEST_NAME), (json.dumps(manifest, indent=1) + "\n").encode())
+    return manifest
+
+
+def main():
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Render the weather SVG icons to PNG in any number of colors and sizes.")
+    parser.add_argument("--colors", default=DEFAULT_COLOR, help=f"Comma-separated icon colors, e.g. '#9acd32,#fff' (default is {DEFAULT_COLOR})")
+    parser.add_argument("--sizes", default=str(DEFAULT_SIZE), help=f"Comma-separated icon sizes in pixels, e.g. 32,64 (default is {DEFAULT_SIZE})")
+    parser.add_argument("--output", default=RENDER_DIR, help=f"Where the <color>__<size> folders go (default is {RENDER_DIR})")
+    parser.add_argument("--workers", default=os.cpu_count() or 1, type=int, help="Render processes to run in parallel (default is one per CPU)")
+    parser.add_argument("--renderer", default="auto", choices=["auto", "cairosvg", "inkscape"], help="Rendering backend (default is cairosvg if installed, else inkscape)")
+    parser.add_argument("--manifest_only", default=None, metavar="ICON_DIR", help="Only (re)write manifest.json for an existing icon folder, e.g. ../lime32")
+    args = parser.parse_args()
+
+    if args.manifest_only:
+        manifest = write_manifest(args.manifest_only)
+        print(f"{len(manifest['icons'])} icons listed in {os.path.join(args.manifest_only, MANIFEST_NAME)}")
+        return 0
+
+    renderer = pick_renderer(args.renderer)
+    if renderer is None:
+        print("Neither cairosvg (pip install cairosvg) nor inkscape is installed.", file=sys.stderr)
+        return 1
+
+    colors = [color.strip() for color in args.colors.split(",") if color.strip()]
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    sources = {}
+    for name in sorted(os.listdir(SVG_DIR)):
+        if name.endswith(".svg"):
+            with open(os.path.join(SVG_DIR, name), "r") as f:
+                sources[name[:-4]] = f.read()
+
+    # Work out every output and the hash of what it would be rendered from
+    os.makedirs(args.output, exist_ok=True)
+    cache_path = os.path.join(args.output, RENDER_CACHE_NAME)
+    cache = load_json(cache_path)
+    outputs = {}  # output path -> content hash
+    jobs = {}     # content hash -> (svg text, size); many ids share the same drawing
+    for color in colors:
+        for size in sizes:
+            set_dir = os.path.join(args.output, f"{color}__{size}")
+            os.makedirs(set_dir, exist_ok=True)
+            for icon_id, svg_text in sources.items():
+                svg_text = recolor(svg_text, color)
+                key = hashlib.sha256(f"{renderer}\0{size}\0{svg_text}".encode()).hexdigest()
+                path = os.path.join(set_dir, f"{icon_id}.png")
+                outputs[path] = key
+                if cache.get(path) != key or not os.path.exists(path):
+                    jobs[key] = (svg_text, size)
+
+    # Render each distinct drawing once, spread over the pool
+    rendered = {}
+    if jobs:
+        with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            futures = {key: executor.submit(render_png, renderer, svg_text, size) for key, (svg_text, size) in jobs.items()}
+            for key, future in futures.items():
+                try:
+                    rendered[key] = future.result()
+                except Exception as e:
+                    print(f"Failed to render an icon - {e}", file=sys.stderr)
+
+    written = 0
+    for path, key in outputs.items():
+        if key in rendered and (cache.get(path) != key or not os.path.exists(path)):
+            write_atomic(path, rendered[key])
+            cache[path] = key
+            written += 1
+    write_atomic(cache_path, json.dumps(cache, indent=1).encode())
+
+    for set_dir in sorted({os.path.dirname(path) for path in outputs}):
+        write_manifest(set_dir)
+
+    print(f"Rendered {len(rendered)} distinct icons with {renderer}, wrote {written} of {len(outputs)} PNGs into {args.output}")
+    return 0 if len(rendered) == len(jobs) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
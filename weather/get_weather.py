@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import json
+import argparse
+import requests
+from datetime import datetime
+import summarize_forecast
+import weather_icons
+from refresh_lock import refresh_lock
+
+# Same cache files get_weather.sh writes, so the parse scripts keep working
+CACHE_DIR = os.path.expanduser("~/.cache/mgconky/")
+FORECAST_PATH = os.path.join(CACHE_DIR, "forecast.json")
+WEATHER_PATH = os.path.join(CACHE_DIR, "weather.json")
+
+# ETag / Last-Modified / freshness bookkeeping for both endpoints
+HTTP_CACHE_PATH = os.path.join(CACHE_DIR, "weather_http_cache.json")
+
+# Held while a run refreshes the files, so overlapping execi runs (or Conky instances) fetch only once
+REFRESH_LOCK_PATH = os.path.join(CACHE_DIR, "weather.lock")
+
+# A run holding the lock longer than this is presumed hung (two requests with a 10 s timeout each)
+REFRESH_LEASE_SECONDS = 60
+
+# OpenWeatherMap endpoint prefix (overridable, e.g. to point the benchmarks at a local mock server)
+API_PREFIX = os.environ.get("MGCONKY_OPENWEATHERMAP_URL", "https://api.openweathermap.org/data/2.5/")
+
+# The free forecast is a list of 3-hour records, so it cannot change within one slot
+FORECAST_SLOT_SECONDS = 3 * 60 * 60
+
+
+def log_error(message):
+    """Print timestamped error message to stderr and flush immediately."""
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{ts}] {message}", file=sys.stderr, flush=True)
+
+
+def atomic_write(path, data):
+    # Write next to the target and rename over it, so readers never see a half-written file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def load_http_cache():
+    try:
+        with open(HTTP_CACHE_PATH, "r") as f:
+            cache = json.load(f)
+        if isinstance(cache, dict):
+            return cache
+    except Exception:
+        # Missing or unreadable -> behave like a first run
+        pass
+    return {}
+
+
+def max_age_seconds(headers):
+    # Freshness lifetime from Cache-Control (max-age), 0 if the server gives none
+    for directive in headers.get("Cache-Control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name.lower() in ("max-age", "s-maxage") and value.isdigit():
+            return int(value)
+    return 0
+
+
+def fetch_endpoint(session, endpoint, params, path, entry):
+    # Conditional GET of one endpoint; returns "updated", "not_modified" or "failed"
+    headers = {}
+    if os.path.exists(path):
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    try:
+        response = session.get(API_PREFIX + endpoint, params=params, headers=headers, timeout=10)
+    except requests.RequestException as e:
+        log_error(f"Failed to fetch {endpoint} - {e}")
+        return "failed"
+
+    if response.status_code == 304:
+        # Unchanged on the server -- keep the file, just extend its freshness
+        entry["fresh_until"] = time.time() + max_age_seconds(response.headers)
+        entry["checked_at"] = time.time()
+        return "not_modified"
+
+    if response.status_code != 200:
+        log_error(f"Failed to fetch {endpoint} (HTTP {response.status_code})")
+        return "failed"
+
+    try:
+        response.json()
+    except ValueError:
+        log_error(f"Invalid JSON received from {endpoint}")
+        return "failed"
+
+    atomic_write(path, response.content)
+    entry["etag"] = response.headers.get("ETag")
+    entry["last_modified"] = response.headers.get("Last-Modified")
+    entry["fresh_until"] = time.time() + max_age_seconds(response.headers)
+    entry["checked_at"] = time.time()
+    return "updated"
+
+
+def update_files(args, params, fresh_since=None):
+    # Refresh whatever is due and publish it (called with the refresh lock held)
+
+    # Validators are only valid for the exact same query (units/city/language)
+    params_key = json.dumps(params, sort_keys=True)
+    http_cache = load_http_cache()
+    now = time.time()
+
+    with requests.Session() as session:
+        for endpoint, path in (("forecast", FORECAST_PATH), ("weather", WEATHER_PATH)):
+            entry = http_cache.get(endpoint, {})
+            if entry.get("params") != params_key:
+                entry = {"params": params_key}
+            http_cache[endpoint] = entry
+
+            result = "skipped"
+            if not os.path.exists(path):
+                result = fetch_endpoint(session, endpoint, params, path, entry)
+            elif fresh_since and entry.get("checked_at", 0) >= fresh_since:
+                # Just fetched (or revalidated) by the run this one waited for
+                pass
+            elif entry.get("fresh_until", 0) > now:
+                # Still fresh according to the server's cache headers
+                pass
+            elif endpoint == "forecast" and entry.get("slot") == int(now // FORECAST_SLOT_SECONDS):
+                # Forecast records only move forward once per 3-hour slot
+                pass
+            else:
+                result = fetch_endpoint(session, endpoint, params, path, entry)
+
+            if endpoint == "forecast":
+                if result in ("updated", "not_modified"):
+                    entry["slot"] = int(now // FORECAST_SLOT_SECONDS)
+                # Keep the per-day summary in step with the published forecast
+                if result == "updated" or os.path.exists(path) and not os.path.exists(summarize_forecast.SUMMARY_PATH):
+                    summarize_forecast.write_summary(path)
+
+    atomic_write(HTTP_CACHE_PATH, json.dumps(http_cache).encode())
+
+    # Point ~/.cache/mgconky/weather0..3.png at the matching icons (replaces the conf's cp -f every 300 s)
+    try:
+        summary = summarize_forecast.load_summary() if os.path.exists(FORECAST_PATH) else None
+        weather_icons.update_icon_links(WEATHER_PATH, summary, args.current_icons, args.forecast_icons)
+    except OSError as e:
+        log_error(f"Failed to update weather icons - {e}")
+
+
+def main():
+    # Same positional arguments as get_weather.sh: API key, city ID, units, optional locale
+    parser = argparse.ArgumentParser(description="Download OpenWeatherMap weather and forecast into ~/.cache/mgconky/.")
+    parser.add_argument("api_key")
+    parser.add_argument("city_id")
+    parser.add_argument("units")
+    parser.add_argument("locale", nargs="?", default=None)
+    parser.add_argument("--current_icons", default=weather_icons.CURRENT_ICON_DIR, help=f"Icon folder for the current weather (default is {weather_icons.CURRENT_ICON_DIR})")
+    parser.add_argument("--forecast_icons", default=weather_icons.FORECAST_ICON_DIR, help=f"Icon folder for the forecast days (default is {weather_icons.FORECAST_ICON_DIR})")
+    args = parser.parse_args()
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    params = {"APPID": args.api_key, "id": args.city_id, "units": args.units}
+    if args.locale is not None:
+        params["lang"] = args.locale.split("_")[0]
+
+    # One run at a time across processes; a run that waited behind another reuses what that one fetched
+    with refresh_lock(REFRESH_LOCK_PATH, REFRESH_LEASE_SECONDS) as (acquired, shared_since):
+        if not acquired:
+            log_error("An earlier weather refresh is still running, leaving the files to it")
+            return
+        update_files(args, params, shared_since)
+
+
+if __name__ == "__main__":
+    main()
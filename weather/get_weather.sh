@@ -52,14 +52,26 @@
 ###################################################################################################################################
 set -eu
 
-# It seems that in conky the execi command will start before curl has completely
-# written the file. For some reason adding a sleep before calling curl fixes it.
-sleep 2
+cache=~/".cache/mgconky"
+forecast="$cache/forecast.json"
+weather="$cache/weather.json"
 
-forecast=~/".cache/mgconky/forecast.json"
-weather=~/".cache/mgconky/weather.json"
+mkdir -p "$cache"
 
-mkdir -p ~/".cache/mgconky"
+# One run at a time (same lock file as get_weather.py).  A run started while another one is still
+# downloading waits for it and then keeps its fresh files, or gives up if it is still busy after 60 s.
+# Opened read-write so waiting does not wipe the owner's "PID lease_expiry" line.
+exec 9<>"$cache/weather.lock"
+if ! flock -n 9; then
+    if ! flock -w 60 9; then
+        echo "An earlier weather refresh is still running, leaving the files to it" >&2
+        exit 1
+    fi
+    exit 0
+fi
+# Written (and later emptied) through fd 9, so it always lands in the file this run holds
+truncate -s 0 /proc/self/fd/9
+echo "$$ $(( $(date +%s) + 60 ))" >&9
 
 api_prefix="api.openweathermap.org/data/2.5/"
 
@@ -68,5 +80,18 @@ id="&id=$2"
 units="&units=$3"
 lang="" ; [[ -v 4 ]] && lang="${4%%_*}" lang="&lang=$lang"
 
-curl -s "${api_prefix}forecast?${appid}${id}${units}${lang}" -o "$forecast"
-curl -s "${api_prefix}weather?${appid}${id}${units}${lang}" -o "$weather"
+# Download next to the target and rename over it, so the parse scripts never read a half-written
+# file (this replaces the old "sleep 2" before the downloads)
+fetch() {
+    if curl -s "$1" -o "$2.$$.tmp"; then
+        mv -f "$2.$$.tmp" "$2"
+    else
+        rm -f "$2.$$.tmp"
+    fi
+}
+
+fetch "${api_prefix}forecast?${appid}${id}${units}${lang}" "$forecast"
+fetch "${api_prefix}weather?${appid}${id}${units}${lang}" "$weather"
+
+# Done: empty the lock file so a finished run is never mistaken for a live owner
+truncate -s 0 /proc/self/fd/9
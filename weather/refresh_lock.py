@@ -0,0 +1,70 @@
+import os
+import time
+import fcntl
+from contextlib import contextmanager
+
+# How often a run waiting behind another one checks whether it has finished
+POLL_SECONDS = 0.2
+
+
+@contextmanager
+def refresh_lock(path, lease_seconds):
+    """Let one weather run at a time refresh the cache files (get_weather.sh takes the same lock).
+
+    Yields (acquired, shared_since).  A run that finds the lock taken waits up to one lease for
+    the owner; shared_since is the time it started waiting, so files written after that are the
+    owner's result and need not be fetched again.  acquired is False if the owner is still busy
+    when the wait runs out.  An owner past the lease expiry in the lock file ("PID lease_expiry")
+    is presumed hung, e.g. a leftover curl still holding the shell script's lock, and its lock
+    file is replaced.
+    """
+    started = time.time()
+    shared_since = None
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            shared_since = started
+            if lease_expired(fd) and is_current(path, fd):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    # Another waiter replaced it first
+                    pass
+            os.close(fd)
+            if time.time() >= started + lease_seconds:
+                yield False, shared_since
+                return
+            time.sleep(POLL_SECONDS)
+            continue
+        if is_current(path, fd):
+            break
+        # Replaced while we were getting it; try the new lock file
+        os.close(fd)
+
+    os.ftruncate(fd, 0)
+    os.write(fd, f"{os.getpid()} {int(time.time() + lease_seconds)}\n".encode())
+    try:
+        yield True, shared_since
+    finally:
+        # Emptied so a finished run is never taken for a live owner; closing drops the lock
+        os.ftruncate(fd, 0)
+        os.close(fd)
+
+
+def lease_expired(fd):
+    # An empty or partial line means the owner is just starting
+    try:
+        _pid, expires = (int(field) for field in os.pread(fd, 64, 0).split())
+    except ValueError:
+        return False
+    return time.time() > expires
+
+
+def is_current(path, fd):
+    # Whether fd is still the file at path (not replaced meanwhile)
+    try:
+        return os.stat(path).st_ino == os.fstat(fd).st_ino
+    except FileNotFoundError:
+        return False
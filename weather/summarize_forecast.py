@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import argparse
+
+# Files written by get_weather.sh and by this script
+CACHE_DIR = os.path.expanduser("~/.cache/mgconky/")
+FORECAST_PATH = os.path.join(CACHE_DIR, "forecast.json")
+SUMMARY_PATH = os.path.join(CACHE_DIR, "forecast_summary.json")
+
+# One tiny file per exported value, so the conf can show it with ${cat ...} (no process per field)
+FIELDS_DIR = os.path.join(CACHE_DIR, "forecast")
+
+# Properties exported as field files, named <day>_<type>_<property> (e.g. 1_max_main_temp_max)
+EXPORT_PROPERTIES = [
+    ".main.temp",
+    ".main.temp_min",
+    ".main.temp_max",
+    ".main.humidity",
+    ".weather[0].id",
+    ".weather[0].description",
+]
+
+
+def flatten(value, path=""):
+    # Turn a forecast record into {".main.temp": 12.3, ".weather[0].id": 800, ...} using jq-style paths
+    if isinstance(value, dict):
+        items = {}
+        for key, child in value.items():
+            items.update(flatten(child, f"{path}.{key}"))
+        return items
+    if isinstance(value, list):
+        items = {}
+        for i, child in enumerate(value):
+            items.update(flatten(child, f"{path}[{i}]"))
+        return items
+    return {path: value}
+
+
+def split_days(records):
+    # The 3-hour records carry no day index.  Day 0 starts at the first record and every
+    # later day starts at a '00:00:00' record, exactly like find_position() in parse_forecast.sh.
+    midnights = [i for i, record in enumerate(records) if str(record.get("dt_txt", "")).endswith("00:00:00")]
+    starts = [0] + midnights
+
+    days = []
+    for start in starts:
+        end = next((i for i in midnights if i > start), len(records))
+        days.append(records[start:end])
+    return days
+
+
+def summarize(forecast):
+    # Single pass over every record: min/max/sum/count for numbers, first value for everything
+    summary = {"days": []}
+
+    for day_records in split_days(forecast.get("list", [])):
+        day = {"min": {}, "max": {}, "avg": {}, "first": {}}
+        sums = {}
+        counts = {}
+
+        for record in day_records:
+            for prop, value in flatten(record).items():
+                day["first"].setdefault(prop, value)
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                day["min"][prop] = min(value, day["min"].get(prop, value))
+                day["max"][prop] = max(value, day["max"].get(prop, value))
+                sums[prop] = sums.get(prop, 0) + value
+                counts[prop] = counts.get(prop, 0) + 1
+
+        day["avg"] = {prop: sums[prop] / counts[prop] for prop in sums}
+        summary["days"].append(day)
+
+    return summary
+
+
+def format_value(value, text=False):
+    # Same output rules as parse_forecast.sh: numbers rounded with printf %.0f, missing values as "null"
+    if value is None:
+        return "null"
+    if text or not isinstance(value, (int, float)):
+        return str(value)
+    return f"{value:.0f}"
+
+
+def lookup(summary, value_type, prop, day):
+    # value_type is one of parse_forecast.sh's types: min, max, avg, first, firsttext
+    days = summary.get("days", [])
+    if not 0 <= day < len(days):
+        return "null"
+    key = "first" if value_type == "firsttext" else value_type
+    return format_value(days[day].get(key, {}).get(prop), text=value_type == "firsttext")
+
+
+def write_if_changed(path, text):
+    # Atomic replace, and only when the value actually changed
+    try:
+        with open(path, "r") as f:
+            if f.read() == text:
+                return
+    except OSError:
+        pass
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def write_summary(forecast_path=FORECAST_PATH, summary_path=SUMMARY_PATH, fields_dir=FIELDS_DIR):
+    # Parse forecast.json once and publish both the JSON summary and the per-field files
+    with open(forecast_path, "r") as f:
+        summary = summarize(json.load(f))
+
+    write_if_changed(summary_path, json.dumps(summary))
+
+    os.makedirs(fields_dir, exist_ok=True)
+    for day, values in enumerate(summary["days"]):
+        for prop in EXPORT_PROPERTIES:
+            name = prop.strip(".").replace("[0]", "").replace(".", "_")
+            for value_type in ("min", "max", "avg", "first"):
+                if prop in values[value_type]:
+                    write_if_changed(
+                        os.path.join(fields_dir, f"{day}_{value_type}_{name}"),
+                        format_value(values[value_type][prop]),
+                    )
+
+    return summary
+
+
+def load_summary(forecast_path=FORECAST_PATH, summary_path=SUMMARY_PATH):
+    # Reuse the summary unless forecast.json has been replaced since it was written
+    try:
+        if os.stat(summary_path).st_mtime >= os.stat(forecast_path).st_mtime:
+            with open(summary_path, "r") as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+    return write_summary(forecast_path, summary_path)
+
+
+def main():
+    # Without arguments: rebuild the summary.  With arguments: answer like parse_forecast.sh does.
+    parser = argparse.ArgumentParser(description="Summarize the OpenWeatherMap 3-hour forecast per day.")
+    parser.add_argument("type", nargs="?", choices=["min", "max", "avg", "first", "firsttext"], help="Value to print")
+    parser.add_argument("prop", nargs="?", help="jq-style property path, e.g. .main.temp_min")
+    parser.add_argument("day", nargs="?", type=int, help="Day index (0 = today)")
+    args = parser.parse_args()
+
+    if not os.access(FORECAST_PATH, os.R_OK):
+        return
+
+    if args.type is None:
+        write_summary()
+    elif args.prop is None or args.day is None:
+        parser.error("type, prop and day must be given together")
+    else:
+        print(lookup(load_summary(), args.type, args.prop, args.day))
+
+
+if __name__ == "__main__":
+    main()
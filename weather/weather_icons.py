@@ -0,0 +1,72 @@
+import os
+import json
+
+# Icon sets shipped next to this script: 64 px for the current weather, 32 px for the forecast days
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CURRENT_ICON_DIR = os.path.join(SCRIPT_DIR, "lime64")
+FORECAST_ICON_DIR = os.path.join(SCRIPT_DIR, "lime32")
+
+# The conf shows ~/.cache/mgconky/weather0.png (now) and weather1..3.png (forecast days 1-3)
+CACHE_DIR = os.path.expanduser("~/.cache/mgconky/")
+FORECAST_ICON_DAYS = (1, 2, 3)
+
+# Written by Make_Icons/render_pngs.py: {"icons": {"<id>": "<file>.png"}, "default": "<file>.png"}
+MANIFEST_NAME = "manifest.json"
+
+
+def load_manifest(icon_dir):
+    # Precomputed icon id -> file map; a folder without one is indexed on the fly
+    try:
+        with open(os.path.join(icon_dir, MANIFEST_NAME), "r") as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict) and isinstance(manifest.get("icons"), dict):
+            return manifest
+    except Exception:
+        pass
+    try:
+        names = os.listdir(icon_dir)
+    except OSError:
+        names = []
+    icons = {name[:-4]: name for name in names if name.endswith(".png")}
+    return {"icons": icons, "default": icons.get("null")}
+
+
+def icon_path(icon_dir, manifest, icon_id):
+    # Absolute path of the icon for a weather id (the set's default for ids without an icon)
+    name = manifest["icons"].get(str(icon_id)) or manifest.get("default")
+    return os.path.join(icon_dir, name) if name else None
+
+
+def link_icon(link_path, target):
+    # Repoint the symlink only when the icon changes, swapping it atomically so Conky never finds it missing
+    if os.path.islink(link_path) and os.readlink(link_path) == target:
+        return False
+    tmp = f"{link_path}.{os.getpid()}.tmp"
+    if os.path.lexists(tmp):
+        os.unlink(tmp)
+    os.symlink(target, tmp)
+    os.replace(tmp, link_path)
+    return True
+
+
+def update_icon_links(weather_path, summary, current_icon_dir=CURRENT_ICON_DIR, forecast_icon_dir=FORECAST_ICON_DIR):
+    # weather0.png follows the current conditions, weatherN.png the first forecast record of day N
+    links = {}
+    try:
+        with open(weather_path, "r") as f:
+            links["weather0.png"] = (current_icon_dir, json.load(f)["weather"][0]["id"])
+    except (OSError, ValueError, KeyError, IndexError, TypeError):
+        pass
+
+    days = (summary or {}).get("days", [])
+    for day in FORECAST_ICON_DAYS:
+        if day < len(days) and ".weather[0].id" in days[day].get("first", {}):
+            links[f"weather{day}.png"] = (forecast_icon_dir, days[day]["first"][".weather[0].id"])
+
+    manifests = {}
+    for name, (icon_dir, icon_id) in links.items():
+        if icon_dir not in manifests:
+            manifests[icon_dir] = load_manifest(icon_dir)
+        target = icon_path(icon_dir, manifests[icon_dir], icon_id)
+        if target:
+            link_icon(os.path.join(CACHE_DIR, name), target)